@@ -0,0 +1,149 @@
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from game_field import GameField
+from levels import Level, is_compiled_level, read_level
+from simulation import Simulation, STATE_RUNNING, STATE_WON, STATE_LOST
+from policies import POLICIES
+
+
+# parsed levels and game fields built from them, shared by all games played in one worker process
+_levels = {}
+_game_fields = {}
+
+
+def _init_worker(levels: dict[str, Level]) -> None:
+    _levels.update(levels)
+
+
+def _get_game_field(level: str) -> GameField:
+    """Returns game field for level, which is built once per process and reset before every game
+    Compiled levels are memory mapped by every worker, so their pages are shared between processes"""
+    if level not in _game_fields:
+        if level not in _levels:
+            _levels[level] = read_level(level)
+        game_field = GameField()
+        game_field.load_level(_levels[level])
+        _game_fields[level] = game_field
+    return _game_fields[level]
+
+
+def play_game(level: str, seed: int, policy_name: str, max_ticks: int, ghosts_chase: bool = False) -> dict:
+    """Plays one headless game with scripted pacman policy
+    Returns result of the game"""
+    simulation = Simulation(_get_game_field(level), seed=seed, ghosts_chase=ghosts_chase)
+    policy = POLICIES[policy_name](seed)
+    pacman = simulation.pacman
+    while simulation.state == STATE_RUNNING and simulation.ticks < max_ticks:
+        direction = policy.choose(simulation)
+        if direction is not None:
+            pacman.change_direction(direction)
+        simulation.step()
+
+    if simulation.state == STATE_LOST:
+        cause_of_death = "ghost"
+    elif simulation.state == STATE_WON:
+        cause_of_death = None
+    else:
+        cause_of_death = "timeout"
+    return {"level": level, "seed": seed, "policy": policy_name, "state": simulation.state,
+            "score": pacman.get_score(), "ticks": simulation.ticks,
+            "pellets_eaten": simulation.game_field.pellets_eaten, "cause_of_death": cause_of_death}
+
+
+def _play_games(games: list[tuple[str, int, str, int, bool]]) -> list[dict]:
+    return [play_game(*game) for game in games]
+
+
+def run_batch(levels: list[str], seeds: list[int], policies: list[str], max_ticks: int,
+              workers: int | None = None, chunk_size: int = 16, ghosts_chase: bool = False):
+    """Plays every combination of level, seed and policy in process pool
+    Yields results of games as soon as they are finished"""
+    unknown_policies = set(policies) - set(POLICIES)
+    if unknown_policies:
+        raise ValueError(f"Unknown policies: {', '.join(sorted(unknown_policies))}")
+
+    parsed_levels = {level: read_level(level) for level in levels if not is_compiled_level(level)}
+    games = [(level, seed, policy, max_ticks, ghosts_chase) for level in levels for policy in policies for seed in seeds]
+    chunks = [games[start:start + chunk_size] for start in range(0, len(games), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker,
+                             initargs=(parsed_levels,)) as executor:
+        futures = [executor.submit(_play_games, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+class BatchStatistics:
+    """Aggregated results of games grouped by level and policy"""
+    numeric_fields = ("score", "ticks", "pellets_eaten")
+
+    def __init__(self) -> None:
+        self.groups = {}
+
+    def add(self, result: dict) -> None:
+        key = result["level"], result["policy"]
+        group = self.groups.setdefault(key, {"games": 0, "wins": 0, "causes_of_death": Counter(),
+                                             "sums": Counter(), "maximums": Counter()})
+        group["games"] += 1
+        group["wins"] += result["state"] == STATE_WON
+        if result["cause_of_death"] is not None:
+            group["causes_of_death"][result["cause_of_death"]] += 1
+        for field in BatchStatistics.numeric_fields:
+            group["sums"][field] += result[field]
+            group["maximums"][field] = max(group["maximums"][field], result[field])
+
+    def as_list(self) -> list[dict]:
+        statistics = []
+        for (level, policy), group in self.groups.items():
+            games = group["games"]
+            statistics.append({"level": level, "policy": policy, "games": games, "win_rate": group["wins"] / games,
+                               "causes_of_death": dict(group["causes_of_death"]),
+                               **{f"mean_{field}": group["sums"][field] / games
+                                  for field in BatchStatistics.numeric_fields},
+                               **{f"max_{field}": group["maximums"][field]
+                                  for field in BatchStatistics.numeric_fields}})
+        return statistics
+
+
+def parse_seeds(seeds: str) -> list[int]:
+    """Returns list of seeds from string like '1,2,10-20'"""
+    result = []
+    for part in seeds.split(','):
+        if '-' in part:
+            first, last = map(int, part.split('-'))
+            result.extend(range(first, last + 1))
+        else:
+            result.append(int(part))
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Plays many headless seeded games with scripted pacman policies")
+    parser.add_argument("levels", nargs='+', help="level scheme files")
+    parser.add_argument("--seeds", default="0-99", help="seeds like '1,2,10-20'")
+    parser.add_argument("--policies", default="greedy", help=f"comma separated, one of: {', '.join(POLICIES)}")
+    parser.add_argument("--max-ticks", type=int, default=100_000, help="ticks after which game is stopped")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes, all cores by default")
+    parser.add_argument("--chase", action="store_true", help="ghosts hunt pacman instead of wandering")
+    parser.add_argument("--output", default=None, help="JSONL file for results of every game, stdout by default")
+    args = parser.parse_args()
+
+    statistics = BatchStatistics()
+    output_file = open(args.output, 'w', encoding="utf-8") if args.output else sys.stdout
+    try:
+        for result in run_batch(args.levels, parse_seeds(args.seeds), args.policies.split(','),
+                                args.max_ticks, args.workers, ghosts_chase=args.chase):
+            statistics.add(result)
+            output_file.write(json.dumps(result) + '\n')
+    finally:
+        if output_file is not sys.stdout:
+            output_file.close()
+    print(json.dumps(statistics.as_list(), indent=2), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,2 @@
+"""Throughput benchmarks for game field and essences
+Run as `python -m benchmarks` from repository root, results are written to JSON file"""
@@ -0,0 +1,173 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+from game_field import GameField
+from simulation import Simulation
+from benchmarks.synthetic import write_level
+import core
+
+
+BUNDLED_LEVELS = ["original level.txt", "level 2.txt"]
+DIRECTIONS = [core.DIR_UP, core.DIR_DOWN, core.DIR_LEFT, core.DIR_RIGHT]
+
+
+def measure(function, min_time: float) -> tuple[int, float]:
+    """Calls function until min_time seconds passed, at least once
+    Returns number of calls and total time in seconds"""
+    iterations, elapsed = 0, 0.0
+    start = time.perf_counter()
+    while iterations == 0 or elapsed < min_time:
+        function()
+        iterations += 1
+        elapsed = time.perf_counter() - start
+    return iterations, elapsed
+
+
+def make_result(benchmark: str, level: str, game_field: GameField, ghosts_count: int,
+                operations: int, frames: int, elapsed: float) -> dict:
+    return {"benchmark": benchmark, "level": level, "width": game_field.width, "height": game_field.height,
+            "ghosts": ghosts_count, "operations": operations, "seconds": elapsed,
+            "ops_per_sec": operations / elapsed, "ms_per_frame": elapsed * 1000 / frames if frames else None}
+
+
+def bench_load(level: str, min_time: float) -> dict:
+    game_field = GameField()
+    iterations, elapsed = measure(lambda: game_field.load_map_scheme(level), min_time)
+    return make_result("load_map_scheme", level, game_field, len(game_field.get_ghosts_cells()),
+                       iterations, iterations, elapsed)
+
+
+def bench_render(level: str, min_time: float) -> dict:
+    game_field = GameField()
+    game_field.load_map_scheme(level)
+    game_field.set_pygame_screen(pygame.Surface(game_field.get_screen_size()))
+    game_field.render()  # builds cached layers before timing
+    iterations, elapsed = measure(game_field.render, min_time)
+    return make_result("render", level, game_field, len(game_field.get_ghosts_cells()),
+                       iterations, iterations, elapsed)
+
+
+def bench_distance(level: str, min_time: float) -> dict:
+    simulation = Simulation(level)
+    game_field, rng = simulation.game_field, random.Random(0)
+    max_x, max_y = (game_field.width - 2) * GameField.cell_size, (game_field.height - 2) * GameField.cell_size
+    queries = [(rng.choice(DIRECTIONS), rng.randrange(GameField.cell_size, max_x),
+                rng.randrange(GameField.cell_size, max_y)) for _ in range(10_000)]
+
+    def run() -> None:
+        for direction, x, y in queries:
+            game_field.min_distance_to_wall(direction, x, y)
+
+    iterations, elapsed = measure(run, min_time)
+    return make_result("min_distance_to_wall", level, game_field, len(simulation.ghosts),
+                       iterations * len(queries), 0, elapsed)
+
+
+def bench_pacman(level: str, min_time: float, frames: int = 1000) -> dict:
+    simulation = Simulation(level)
+    pacman, rng = simulation.pacman, random.Random(0)
+
+    def run() -> None:
+        for frame in range(frames):
+            if frame % 32 == 0:
+                pacman.change_direction(rng.choice(DIRECTIONS))
+            pacman.move(Simulation.tick_ms)
+
+    iterations, elapsed = measure(run, min_time)
+    return make_result("pacman_move", level, simulation.game_field, len(simulation.ghosts),
+                       iterations * frames, iterations * frames, elapsed)
+
+
+def bench_ghosts(level: str, min_time: float, frames: int = 100) -> dict:
+    simulation = Simulation(level)
+    pacman, ghosts = simulation.pacman, simulation.ghosts
+    random.seed(0)
+
+    def run() -> None:
+        for _ in range(frames):
+            for ghost in ghosts:
+                ghost.move(Simulation.tick_ms, pacman)
+
+    iterations, elapsed = measure(run, min_time)
+    return make_result("ghost_move", level, simulation.game_field, len(ghosts),
+                       iterations * frames * len(ghosts), iterations * frames, elapsed)
+
+
+def bench_ghost_swarm(level: str, min_time: float, frames: int = 100) -> dict:
+    simulation = Simulation(level, seed=0, ghost_swarm=True)
+    pacman, swarm = simulation.pacman, simulation.ghost_swarm
+
+    def run() -> None:
+        for _ in range(frames):
+            swarm.move(Simulation.tick_ms, pacman)
+
+    iterations, elapsed = measure(run, min_time)
+    return make_result("ghost_swarm_move", level, simulation.game_field, len(swarm),
+                       iterations * frames * len(swarm), iterations * frames, elapsed)
+
+
+def get_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes: list[int], ghosts_counts: list[int], min_time: float) -> list[dict]:
+    levels = [(level, False) for level in BUNDLED_LEVELS]
+    for size in sizes:
+        levels.append((write_level(size, size, ghosts_counts[0]), False))
+        levels.extend((write_level(size, size, ghosts_count), True) for ghosts_count in ghosts_counts[1:])
+
+    results = []
+    for level, ghosts_only in levels:
+        benchmarks = [bench_ghosts, bench_ghost_swarm] if ghosts_only else \
+            [bench_load, bench_render, bench_distance, bench_pacman, bench_ghosts, bench_ghost_swarm]
+        for benchmark in benchmarks:
+            try:
+                result = benchmark(level, min_time)
+            except (pygame.error, MemoryError, ValueError) as error:
+                result = {"benchmark": benchmark.__name__[len("bench_"):], "level": level, "error": str(error)}
+            results.append(result)
+            print(json.dumps(result), flush=True)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measures throughput of game field and essences")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file to write results to")
+    parser.add_argument("--sizes", default="20,100,500,2000", help="comma separated sides of synthetic levels")
+    parser.add_argument("--ghosts", default="4,50,500", help="comma separated ghosts counts")
+    parser.add_argument("--min-time", type=float, default=0.5, help="minimum seconds to run every benchmark")
+    parser.add_argument("--quick", action="store_true", help="only small levels and short runs")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    ghosts_counts = [int(count) for count in args.ghosts.split(',')]
+    if args.quick:
+        sizes, ghosts_counts, args.min_time = [size for size in sizes if size <= 100], ghosts_counts[:2], 0.1
+
+    pygame.init()
+    started = time.time()
+    results = run_benchmarks(sizes, ghosts_counts, args.min_time)
+    report = {"meta": {"commit": get_commit(), "started": started, "python": platform.python_version(),
+                       "pygame": pygame.version.ver, "platform": platform.platform(),
+                       "tick_ms": Simulation.tick_ms, "min_time": args.min_time},
+              "results": results}
+    with open(args.output, 'w', encoding="utf-8") as output_file:
+        json.dump(report, output_file, indent=2)
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    main()
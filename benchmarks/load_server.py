@@ -0,0 +1,136 @@
+"""Load test of game server with hundreds of simulated clients on localhost
+Run as `python -m benchmarks.load_server` from repository root, server is started in subprocess"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from server import run_server, parse_address, read_message, encode_join, encode_direction, DEFAULT_LEVELS, \
+    MSG_TICK, MSG_ERROR
+from simulation import Simulation
+import core
+
+
+DIRECTIONS = [core.DIR_UP, core.DIR_DOWN, core.DIR_LEFT, core.DIR_RIGHT]
+
+
+async def open_connection(address: str) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    host, port = parse_address(address)
+    if host == "unix":
+        return await asyncio.open_unix_connection(port)
+    return await asyncio.open_connection(host, port)
+
+
+async def wait_for_server(address: str, timeout: float = 10.0) -> None:
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            _, writer = await open_connection(address)
+            writer.close()
+            return
+        except (OSError, ValueError):
+            if time.perf_counter() > deadline:
+                raise RuntimeError(f"Server did not start on {address}")
+            await asyncio.sleep(0.05)
+
+
+async def run_client(address: str, match: str, level: str, deadline: float, seed: int, result: dict) -> None:
+    """Plays in given match with random keys until deadline, joins it again when game ends
+    Counts received ticks, their sizes and gaps between them"""
+    loop, rng = asyncio.get_running_loop(), random.Random(seed)
+    while loop.time() < deadline:
+        reader, writer = await open_connection(address)
+        writer.write(encode_join(match, level))
+        result["joins"] += 1
+        last_tick_time = None
+        try:
+            while True:
+                message_type, payload = await asyncio.wait_for(read_message(reader), deadline - loop.time())
+                now = loop.time()
+                if message_type == MSG_ERROR:
+                    raise RuntimeError(payload.decode("utf-8"))
+                if message_type != MSG_TICK:
+                    continue
+                result["ticks"] += 1
+                result["bytes"] += len(payload)
+                if last_tick_time is not None:
+                    result["gaps"].append(now - last_tick_time)
+                last_tick_time = now
+                if rng.random() < 0.05:
+                    writer.write(encode_direction(rng.choice(DIRECTIONS)))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            result["games_ended"] += 1
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            writer.close()
+
+
+async def run_clients(address: str, clients: int, clients_per_match: int, seconds: float,
+                      levels: list[str]) -> list[dict]:
+    await wait_for_server(address)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + seconds
+    results = [{"joins": 0, "ticks": 0, "bytes": 0, "gaps": [], "games_ended": 0} for _ in range(clients)]
+    await asyncio.gather(*(run_client(address, f"load_{index // clients_per_match}",
+                                      levels[index // clients_per_match % len(levels)], deadline, index,
+                                      results[index])
+                           for index in range(clients)))
+    return results
+
+
+def percentile(values: list[float], fraction: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def make_report(results: list[dict], seconds: float, clients_per_match: int, address: str) -> dict:
+    gaps = [gap * 1000 for result in results for gap in result["gaps"]]
+    ticks = sum(result["ticks"] for result in results)
+    rates = [result["ticks"] / seconds for result in results]
+    return {"address": address, "clients": len(results), "matches": -(-len(results) // clients_per_match),
+            "seconds": seconds, "expected_ticks_per_sec": 1000 / Simulation.tick_ms,
+            "ticks_per_sec_mean": statistics.mean(rates), "ticks_per_sec_min": min(rates),
+            "messages_per_sec": ticks / seconds, "bytes_per_tick": sum(result["bytes"] for result in results) /
+            ticks if ticks else None, "tick_gap_ms_p50": percentile(gaps, 0.5),
+            "tick_gap_ms_p99": percentile(gaps, 0.99), "tick_gap_ms_max": max(gaps, default=None),
+            "joins": sum(result["joins"] for result in results),
+            "games_ended": sum(result["games_ended"] for result in results)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measures game server with many simulated clients")
+    parser.add_argument("--address", default=None, help="HOST:PORT or unix:PATH, temporary unix socket by default")
+    parser.add_argument("--clients", type=int, default=300, help="number of simulated clients")
+    parser.add_argument("--clients-per-match", type=int, default=2, help="clients sharing one match")
+    parser.add_argument("--seconds", type=float, default=10.0, help="duration of the test")
+    parser.add_argument("--output", default=None, help="JSON file to write report to")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        address = args.address or "unix:" + os.path.join(directory, "server.sock")
+        process = multiprocessing.Process(target=run_server, args=(address, DEFAULT_LEVELS), daemon=True)
+        process.start()
+        try:
+            results = asyncio.run(run_clients(address, args.clients, args.clients_per_match, args.seconds,
+                                              DEFAULT_LEVELS))
+        finally:
+            process.terminate()
+            process.join()
+
+    report = make_report(results, args.seconds, args.clients_per_match, address)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
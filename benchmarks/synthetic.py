@@ -0,0 +1,47 @@
+import os
+import random
+import tempfile
+import zlib
+
+
+def generate_level(width: int, height: int, ghosts_count: int, seed: int = 0) -> list[str]:
+    """Returns level scheme of given size with pillars grid, random extra walls,
+    pacman in the upper left corner and ghosts spread across free cells"""
+    if width < 5 or height < 5:
+        raise ValueError("Synthetic level must be at least 5x5 cells")
+
+    rng = random.Random(seed)
+    rows = [['#'] * width]
+    for row in range(1, height - 1):
+        current_row = ['#']
+        for col in range(1, width - 1):
+            if row % 2 == 0 and col % 2 == 0:
+                current_row.append('*')
+            elif row % 2 == 0 and rng.random() < 0.15 and 1 < col < width - 2:
+                current_row.append('*')
+            else:
+                current_row.append(' ')
+        current_row.append('#')
+        rows.append(current_row)
+    rows.append(['#'] * width)
+
+    rows[1][1] = '%'
+    rows[1][3] = '$'
+    free_cells = [(row, col) for row in range(1, height - 1) for col in range(1, width - 1)
+                  if rows[row][col] == ' ' and (row, col) != (1, 2)]
+    for row, col in rng.sample(free_cells, min(ghosts_count, len(free_cells))):
+        rows[row][col] = '@'
+    return [''.join(row) for row in rows]
+
+
+def write_level(width: int, height: int, ghosts_count: int, seed: int = 0, directory: str = None) -> str:
+    """Generates level and saves it in level text format, file name contains checksum of level,
+    so file left by another version of generator is never reused
+    Returns name of written file"""
+    directory = directory or tempfile.gettempdir()
+    data = '\n'.join(generate_level(width, height, ghosts_count, seed)).encode("utf-8")
+    file_name = os.path.join(directory, f"synthetic_{width}x{height}_{ghosts_count}_{seed}_{zlib.crc32(data):08x}.txt")
+    if not os.path.isfile(file_name):
+        with open(file_name, 'wb') as output_file:
+            output_file.write(data)
+    return file_name
@@ -0,0 +1,194 @@
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+
+# pygame greeting would be mixed with raw frames written to standard output
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+import pygame
+
+from simulation import Simulation
+from renderer import GameRenderer
+from replay import Recording, replay
+
+
+FORMAT_RAW, FORMAT_PNG = "raw", "png"
+# masks of 24 bit surface which pixels bytes go in R, G, B order, so its buffer is raw RGB frame
+RGB_MASKS = (0xFF, 0xFF00, 0xFF0000, 0) if sys.byteorder == "little" else (0xFF0000, 0xFF00, 0xFF, 0)
+DEFAULT_POOL_SIZE = 8
+
+
+def make_rgb_surface(size: tuple[int, int]) -> pygame.Surface:
+    return pygame.Surface(size, 0, 24, RGB_MASKS)
+
+
+def get_frame_bytes(surface: pygame.Surface):
+    """Returns raw RGB frame of surface made by make_rgb_surface, which is view of surface pixels
+    if its rows are not padded, surface is locked until returned object is deleted"""
+    width, height = surface.get_size()
+    pixels = surface.get_buffer()
+    if surface.get_pitch() == width * 3:
+        return pixels
+    return np.frombuffer(pixels, dtype=np.uint8).reshape(height, -1)[:, :width * 3].tobytes()
+
+
+class OffscreenRenderer(GameRenderer):
+    """Draws game into surface which is not shown, so no display is needed
+    Every frame is drawn whole, so target surface may be changed between frames"""
+
+    def __init__(self, simulation: Simulation, screen: pygame.Surface | None = None) -> None:
+        if screen is None:
+            screen = make_rgb_surface(simulation.game_field.get_screen_size())
+        # score is drawn with font, which is the only pygame module needed
+        pygame.font.init()
+        super().__init__(screen, simulation)
+
+    def set_screen(self, screen: pygame.Surface) -> None:
+        self.screen = screen
+        self.simulation.game_field.set_pygame_screen(screen)
+
+    def present(self, rects: list[pygame.Rect] | None = None) -> None:
+        pass
+
+
+class FrameWriter:
+    """Writes frames to raw RGB file or PNG files on background thread
+    Frames are drawn into surfaces from pool, writer takes surface itself and gives it back after writing,
+    so frames are neither copied nor allocated, drawing waits for writer when all surfaces are queued"""
+
+    def __init__(self, output: str, size: tuple[int, int], frame_format: str = FORMAT_RAW,
+                 pool_size: int = DEFAULT_POOL_SIZE) -> None:
+        """Output is file for raw frames, "-" stands for standard output, or directory for PNG files"""
+        if frame_format not in (FORMAT_RAW, FORMAT_PNG):
+            raise ValueError(f"Unknown frame format '{frame_format}'")
+        self.output, self.size, self.frame_format = output, tuple(size), frame_format
+        self.output_file = None
+        if frame_format == FORMAT_PNG:
+            os.makedirs(output, exist_ok=True)
+        elif output == "-":
+            self.output_file = sys.stdout.buffer
+        else:
+            self.output_file = open(output, 'wb')
+
+        self.free_surfaces = queue.Queue()
+        for _ in range(pool_size):
+            self.free_surfaces.put(make_rgb_surface(self.size))
+        self.frames = queue.Queue(maxsize=pool_size + 1)
+        self.frames_written = 0
+        self.error = None
+        self.thread = threading.Thread(target=self.run, name="frame writer", daemon=True)
+        self.thread.start()
+
+    def take_surface(self) -> pygame.Surface:
+        """Returns free surface to draw next frame into, waits for writer if there is no one"""
+        return self.free_surfaces.get()
+
+    def write(self, tick: int, surface: pygame.Surface) -> None:
+        """Queues frame drawn on surface from take_surface, tick names PNG file of frame"""
+        if self.error is not None:
+            raise RuntimeError(f"Unable to write frames: {self.error}")
+        self.frames.put((tick, surface))
+
+    def write_frame(self, tick: int, surface: pygame.Surface) -> None:
+        if self.frame_format == FORMAT_PNG:
+            pygame.image.save(surface, os.path.join(self.output, f"tick_{tick:08d}.png"))
+        else:
+            self.output_file.write(get_frame_bytes(surface))
+        self.frames_written += 1
+
+    def run(self) -> None:
+        while True:
+            frame = self.frames.get()
+            if frame is None:
+                return
+            # after error frames are dropped, but surfaces are still given back, so drawing does not hang
+            if self.error is None:
+                try:
+                    self.write_frame(*frame)
+                except (OSError, pygame.error) as error:
+                    self.error = error
+            self.free_surfaces.put(frame[1])
+
+    def close(self) -> None:
+        """Waits for queued frames to be written"""
+        self.frames.put(None)
+        self.thread.join()
+        if self.output_file is not None:
+            if self.output_file is sys.stdout.buffer:
+                self.output_file.flush()
+            else:
+                self.output_file.close()
+        if self.error is not None:
+            raise RuntimeError(f"Unable to write frames: {self.error}")
+
+
+def get_output_size(screen_size: tuple[int, int], scale: float) -> tuple[int, int]:
+    return max(1, round(screen_size[0] * scale)), max(1, round(screen_size[1] * scale))
+
+
+def export_replay(recording: Recording, output: str, frame_format: str = FORMAT_RAW, scale: float = 1.0,
+                  frame_step: int = 1, first_tick: int = 1, last_tick: int | None = None,
+                  pool_size: int = DEFAULT_POOL_SIZE) -> tuple[Simulation, int]:
+    """Replays recorded game and draws offscreen every frame_step-th tick from first to last one,
+    frames are downsampled by scale and written by background FrameWriter
+    Returns simulation in the state the recorded game ended in and number of written frames"""
+    if frame_step < 1 or not 0 < scale <= 1:
+        raise ValueError("Frame step must be positive and scale must be in (0, 1]")
+    last_tick = recording.final_ticks if last_tick is None else last_tick
+    writer, renderer = None, None
+
+    def on_render(simulation: Simulation) -> None:
+        nonlocal writer, renderer
+        if renderer is None:
+            renderer = OffscreenRenderer(simulation)
+            writer = FrameWriter(output, get_output_size(renderer.screen.get_size(), scale), frame_format,
+                                 pool_size)
+        surface = writer.take_surface()
+        if scale == 1:
+            renderer.set_screen(surface)
+            renderer.render()
+        else:
+            renderer.render()
+            pygame.transform.smoothscale(renderer.screen, writer.size, surface)
+        writer.write(simulation.ticks, surface)
+
+    try:
+        simulation = replay(recording, range(first_tick, last_tick + 1, frame_step), on_render,
+                            sprites_images=True)
+    finally:
+        if writer is not None:
+            writer.close()
+    return simulation, writer.frames_written if writer is not None else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Exports frames of recorded game drawn without display")
+    parser.add_argument("recording", help="recorded game file")
+    parser.add_argument("output", help="raw RGB frames file, - for standard output, or directory for PNG files")
+    parser.add_argument("--format", default=FORMAT_RAW, choices=[FORMAT_RAW, FORMAT_PNG], help="frames format")
+    parser.add_argument("--scale", type=float, default=1.0, help="frames size relative to game screen")
+    parser.add_argument("--frame-step", type=int, default=1, help="only every n-th tick is exported")
+    parser.add_argument("--first-tick", type=int, default=1, help="first exported tick")
+    parser.add_argument("--last-tick", type=int, default=None, help="last exported tick, game end by default")
+    parser.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE,
+                        help="frames which may wait for writing at once")
+    args = parser.parse_args()
+
+    recording = Recording.load(args.recording)
+    start_time = time.perf_counter()
+    simulation, frames = export_replay(recording, args.output, args.format, args.scale, args.frame_step,
+                                       args.first_tick, args.last_tick, args.pool_size)
+    elapsed = time.perf_counter() - start_time
+    width, height = get_output_size(simulation.game_field.get_screen_size(), args.scale)
+    game_seconds = simulation.ticks * simulation.tick_ms / 1000
+    # report goes to stderr, because raw frames may be written to stdout
+    print(f"{frames} frames {width}x{height} at {1000 / (simulation.tick_ms * args.frame_step):g} fps, "
+          f"exported in {elapsed:.2f} s, {game_seconds / elapsed:.1f}x real time", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,8 @@ import pygame
 DIR_UP, DIR_DOWN, DIR_LEFT, DIR_RIGHT = "up", "down", "left", "right"
 directions_codes = {"up": (0, 1), "down": (0, -1), "left": (-1, 0), "right": (1, 0),
                     (0, 1): "up", (0, -1): "down", (-1, 0): "left", (1, 0): "right"}
+# shifts of row and column indexes of game field cell for moving one cell in direction
+cells_shifts = {"up": (-1, 0), "down": (1, 0), "left": (0, -1), "right": (0, 1)}
 
 
 def is_opposite(direction_1: str, direction_2: str) -> bool:
@@ -30,3 +32,58 @@ def load_image(name: str) -> pygame.image:
 
     image = pygame.image.load(fullname)
     return image
+
+
+# images shared by all sprites, keyed by file name and size
+_images_cache = {}
+_frames_cache = {}
+_masks_cache = {}
+
+
+def get_image(name: str, size: tuple[int, int] | None = None) -> pygame.Surface:
+    """Returns image from given file name scaled to given size, which is loaded once per process
+    Image is converted to display pixel format as soon as display is set"""
+    key = name, size
+    image, converted = _images_cache.get(key, (None, False))
+    if image is None:
+        image = load_image(name) if size is None else pygame.transform.scale(get_image(name), size)
+    if not converted and pygame.display.get_init() and pygame.display.get_surface() is not None:
+        image = image.convert_alpha() if image.get_flags() & pygame.SRCALPHA else image.convert()
+        converted = True
+    _images_cache[key] = image, converted
+    return image
+
+
+def preload_image(name: str, size: tuple[int, int] | None = None) -> None:
+    """Decodes image into cache without converting it, so it may be called from worker thread
+    while main thread uses display, get_image converts it later"""
+    if (name, size) in _images_cache:
+        return
+    image = _images_cache.get((name, None), (None, False))[0] or load_image(name)
+    if size is not None:
+        image = pygame.transform.scale(image, size)
+    _images_cache.setdefault((name, size), (image, False))
+
+
+def get_frames(sheet_name: str, frame_size: tuple[int, int]) -> list[pygame.Surface]:
+    """Returns animation frames cut from sprites sheet row by row, which are sliced once per sheet"""
+    key = sheet_name, frame_size
+    sheet = get_image(sheet_name)
+    frames = _frames_cache.get(key)
+    if frames is None or frames[0].get_parent() is not sheet:
+        frames = []
+        for row in range(sheet.get_height() // frame_size[1]):
+            for col in range(sheet.get_width() // frame_size[0]):
+                frame_location = (frame_size[0] * col, frame_size[1] * row)
+                frames.append(sheet.subsurface(pygame.Rect(frame_location, frame_size)))
+        _frames_cache[key] = frames
+    return frames
+
+
+def get_mask(image: pygame.Surface) -> pygame.mask.Mask:
+    """Returns collision mask for given shared image, which is built once per image"""
+    mask = _masks_cache.get(id(image))
+    if mask is None or mask[0] is not image:
+        mask = image, pygame.mask.from_surface(image)
+        _masks_cache[id(image)] = mask
+    return mask[1]
@@ -0,0 +1,200 @@
+import multiprocessing
+import random
+
+import numpy as np
+
+from game_field import GameField
+from simulation import Simulation, STATE_RUNNING
+from levels import WALL_CODES
+import core
+
+
+# action 0 keeps current pacman direction
+ACTIONS = [None, core.DIR_UP, core.DIR_DOWN, core.DIR_LEFT, core.DIR_RIGHT]
+CELL_FREE, CELL_WALL = 0, 1
+# maps every cell code to its type in observation
+CELLS_TYPES_TABLE = bytes(CELL_WALL if code in WALL_CODES else CELL_FREE for code in range(256))
+
+
+class PacmanEnv:
+    """Gym-style environment for training agents on headless seeded games
+    Observation is dictionary of NumPy arrays: "cells" types grid, "pellets" mask of live pellets,
+    "positions" field cords of pacman and then of every ghost and "magic" flags of ghosts
+    Reward of a step is score gained by eating pellets during it
+    If seed is not given, random one is drawn, so every game may be reproduced by seed from info"""
+
+    def __init__(self, level: str, seed: int | None = None, ticks_per_step: int = 1, max_ticks: int | None = None,
+                 ghosts_chase: bool = False, ghost_swarm: bool = False) -> None:
+        self.game_field = GameField()
+        self.game_field.load_map_scheme(level)
+        self.shape = self.game_field.height, self.game_field.width
+        self.cells = np.frombuffer(bytes(self.game_field.cells).translate(CELLS_TYPES_TABLE),
+                                   dtype=np.uint8).reshape(self.shape)
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.ticks_per_step = ticks_per_step
+        self.max_ticks = max_ticks
+        self.ghosts_chase, self.ghost_swarm = ghosts_chase, ghost_swarm
+        self.simulation = None
+
+    def get_observation(self) -> dict[str, np.ndarray]:
+        observation = {"cells": self.cells, "pellets": np.empty(self.shape, dtype=np.uint8),
+                       "positions": np.empty((len(self.simulation.ghosts) + 1, 2), dtype=np.int32),
+                       "magic": np.empty(len(self.simulation.ghosts), dtype=bool)}
+        self.write_observation(observation["pellets"], observation["positions"], observation["magic"])
+        return observation
+
+    def write_observation(self, pellets: np.ndarray, positions: np.ndarray, magic: np.ndarray) -> None:
+        """Fills given arrays with current observation, so batches are built without temporary arrays"""
+        pellets.reshape(-1)[:] = np.frombuffer(self.game_field.live_pellets, dtype=np.uint8)
+        positions[:] = self.simulation.get_positions()
+        magic[:] = [ghost.is_in_magic_state() for ghost in self.simulation.ghosts]
+
+    def reset(self, seed: int | None = None) -> tuple[dict[str, np.ndarray], dict]:
+        """Starts new game on the same level, seed given at creation is used if it is not given
+        Returns observation and info"""
+        if seed is not None:
+            self.seed = seed
+        self.simulation = Simulation(self.game_field, seed=self.seed, ghosts_chase=self.ghosts_chase,
+                                     ghost_swarm=self.ghost_swarm)
+        return self.get_observation(), {"seed": self.seed}
+
+    def step(self, action: int) -> tuple[dict[str, np.ndarray], int, bool, bool, dict]:
+        """Changes pacman direction by action index in ACTIONS and advances game by ticks_per_step ticks
+        Returns observation, reward, whether game ended, whether it was cut by max_ticks and info"""
+        reward, terminated, truncated, info = self.play_step(action)
+        return self.get_observation(), reward, terminated, truncated, info
+
+    def play_step(self, action: int) -> tuple[int, bool, bool, dict]:
+        """Same as step, but observation is not built"""
+        if self.simulation is None:
+            raise RuntimeError("Environment has to be reset before first step")
+
+        simulation, pacman = self.simulation, self.simulation.pacman
+        if ACTIONS[action] is not None:
+            pacman.change_direction(ACTIONS[action])
+        score = pacman.current_score
+        simulation.step(self.ticks_per_step)
+        terminated = simulation.state != STATE_RUNNING
+        truncated = not terminated and self.max_ticks is not None and simulation.ticks >= self.max_ticks
+        info = {"state": simulation.state, "ticks": simulation.ticks, "score": pacman.current_score}
+        return pacman.current_score - score, terminated, truncated, info
+
+
+class EnvGroup:
+    """Environments of one level stepped together, finished games are reset right away
+    Seeds of next games of every environment are increased by seeds_step, count of environments by default,
+    so runs are repeatable"""
+
+    def __init__(self, level: str, seeds: list[int], env_options: dict, seeds_step: int | None = None) -> None:
+        self.envs = [PacmanEnv(level, seed, **env_options) for seed in seeds]
+        self.seeds_step = seeds_step or len(seeds)
+        ghosts_count = len(self.envs[0].game_field.get_ghosts_cells())
+        self.pellets = np.empty((len(seeds),) + self.envs[0].shape, dtype=np.uint8)
+        self.positions = np.empty((len(seeds), ghosts_count + 1, 2), dtype=np.int32)
+        self.magic = np.empty((len(seeds), ghosts_count), dtype=bool)
+
+    def get_observations(self) -> dict[str, np.ndarray]:
+        for index, env in enumerate(self.envs):
+            env.write_observation(self.pellets[index], self.positions[index], self.magic[index])
+        return {"pellets": self.pellets.copy(), "positions": self.positions.copy(), "magic": self.magic.copy()}
+
+    def reset(self) -> dict[str, np.ndarray]:
+        for env in self.envs:
+            env.reset()
+        return self.get_observations()
+
+    def step(self, actions: list[int]) -> tuple:
+        rewards = np.empty(len(self.envs), dtype=np.int32)
+        terminated, truncated = np.empty(len(self.envs), dtype=bool), np.empty(len(self.envs), dtype=bool)
+        infos = []
+        for index, (env, action) in enumerate(zip(self.envs, actions)):
+            reward, env_terminated, env_truncated, info = env.play_step(action)
+            if env_terminated or env_truncated:
+                env.reset(env.seed + self.seeds_step)
+            rewards[index], terminated[index], truncated[index] = reward, env_terminated, env_truncated
+            infos.append(info)
+        return self.get_observations(), rewards, terminated, truncated, infos
+
+
+def _run_worker(connection, level: str, seeds: list[int], env_options: dict, seeds_step: int) -> None:
+    """Serves commands of VectorEnv for group of environments in subprocess"""
+    group = EnvGroup(level, seeds, env_options, seeds_step)
+    while True:
+        command, data = connection.recv()
+        if command == "reset":
+            connection.send(group.reset())
+        elif command == "step":
+            connection.send(group.step(data))
+        elif command == "close":
+            connection.close()
+            return
+
+
+class VectorEnv:
+    """Steps many independent games of one level in one call, optionally in subprocesses
+    Observations are stacked along first axis, "cells" grid is shared by all games
+    Game which ended is reset automatically, its last info is still returned"""
+
+    def __init__(self, level: str, count: int, seed: int = 0, workers: int = 0, **env_options) -> None:
+        """Game number i starts with seed + i, workers is number of subprocesses, 0 to step all games here"""
+        if count <= 0:
+            raise ValueError("Number of environments must be positive")
+
+        seeds = list(range(seed, seed + count))
+        self.count = count
+        self.workers = min(workers, count)
+        probe = PacmanEnv(level)
+        self.cells = probe.cells
+        self.group, self.connections, self.processes = None, [], []
+        if not self.workers:
+            self.group = EnvGroup(level, seeds, env_options)
+            return
+
+        self.slices = [slice(count * index // self.workers, count * (index + 1) // self.workers)
+                       for index in range(self.workers)]
+        for worker_slice in self.slices:
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_run_worker, daemon=True,
+                                              args=(worker_connection, level, seeds[worker_slice], env_options, count))
+            process.start()
+            worker_connection.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+
+    def add_cells(self, observations: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+        observations["cells"] = np.broadcast_to(self.cells, (self.count,) + self.cells.shape)
+        return observations
+
+    def reset(self) -> dict[str, np.ndarray]:
+        if self.group is not None:
+            return self.add_cells(self.group.reset())
+
+        for connection in self.connections:
+            connection.send(("reset", None))
+        parts = [connection.recv() for connection in self.connections]
+        return self.add_cells({key: np.concatenate([part[key] for part in parts]) for key in parts[0]})
+
+    def step(self, actions) -> tuple:
+        """Returns stacked observations, rewards, terminated and truncated flags and list of infos"""
+        if len(actions) != self.count:
+            raise ValueError(f"Expected {self.count} actions, got {len(actions)}")
+
+        actions = list(map(int, actions))
+        if self.group is not None:
+            observations, *results = self.group.step(actions)
+            return (self.add_cells(observations), *results)
+
+        for connection, worker_slice in zip(self.connections, self.slices):
+            connection.send(("step", actions[worker_slice]))
+        parts = [connection.recv() for connection in self.connections]
+        observations = self.add_cells({key: np.concatenate([part[0][key] for part in parts]) for key in parts[0][0]})
+        return observations, np.concatenate([part[1] for part in parts]), np.concatenate([part[2] for part in parts]), \
+            np.concatenate([part[3] for part in parts]), [info for part in parts for info in part[4]]
+
+    def close(self) -> None:
+        for connection in self.connections:
+            connection.send(("close", None))
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.connections, self.processes = [], []
@@ -2,7 +2,7 @@ import random
 
 import pygame
 
-from game_field import GameField, Pellet, get_indexes_by_cords
+from game_field import GameField, get_indexes_by_cords
 import core
 
 
@@ -20,12 +20,40 @@ def new_cords(cords: list[int, int], direction: str, distance_to_wall: int,
     return cords
 
 
+# directions of straight corridor along every axis in order of Ghost.directions
+CORRIDOR_DIRECTIONS = ([core.DIR_LEFT, core.DIR_RIGHT], [core.DIR_UP, core.DIR_DOWN])
+
+
+def choose_direction(rng: random.Random, possible_directions: list, back_direction):
+    """Returns the only possible direction or random one of others than back direction
+    All random decisions about ways of ghosts are taken here, so ghosts moved by different code paths
+    take the same random sequence"""
+    if len(possible_directions) == 1:
+        return possible_directions[0]
+    return rng.choice([direction for direction in possible_directions if direction != back_direction])
+
+
+def get_corridor_way(entity: pygame.sprite.Sprite) -> tuple[int, int, int] | None:
+    """Returns way of entity along straight corridor it moves in, where it can neither turn nor meet wall
+    until it reaches exit at junction: index of cord changed along way, sign of its change and exit cord,
+    None if entity is not in corridor"""
+    direction, (x, y) = entity.current_direction, entity.current_cords
+    corridor = entity.game_field.get_corridor(direction, x, y)
+    if corridor is None:
+        return None
+    horizontal, _, low, high = corridor
+    if direction in (core.DIR_LEFT, core.DIR_UP):
+        return 0 if horizontal else 1, -1, low
+    return 0 if horizontal else 1, 1, high
+
+
 class Pacman(pygame.sprite.Sprite):
     ticks_to_move_1_px, ticks_to_update_animation = 8, 30
     direction_frames_indexes = {core.DIR_UP: 4, core.DIR_DOWN: 6, core.DIR_LEFT: 0, core.DIR_RIGHT: 2}
 
     def __init__(self, start_direction: str, start_cords: list[int, int],
-                 game_field: GameField, sprites_sheet: str) -> None:
+                 game_field: GameField, sprites_sheet: str | None = None) -> None:
+        """Sprites sheet may be omitted for headless simulation, then no images are loaded"""
         if start_direction not in [core.DIR_UP, core.DIR_DOWN, core.DIR_LEFT, core.DIR_RIGHT]:
             raise ValueError("Incorrect direction given")
 
@@ -36,40 +64,73 @@ class Pacman(pygame.sprite.Sprite):
         self.game_field = game_field
         self.ticks_passed = 0
         self.animation_ticks_passed = 0
-        self.ex_cell = get_indexes_by_cords(*start_cords)
         self.current_score = 0
+        # way pacman follows without checking walls until next decision, see find_way,
+        # and cord along it at which the nearest pellet ahead is eaten
+        self.way, self.pellet_cord = None, None
 
         self.rect = pygame.Rect((start_cords[0], start_cords[1],
                                  GameField.cell_size, GameField.cell_size))
-        self.cut_sheet(core.load_image(sprites_sheet))
-
-    def cut_sheet(self, sheet: pygame.image) -> None:
-        """Processes image to prepare animation sheets"""
-        self.frames = []
-        columns, rows = sheet.get_width() // GameField.cell_size,\
-            sheet.get_height() // GameField.cell_size
-
-        for j in range(rows):
-            for i in range(columns):
-                frame_location = (GameField.cell_size * i, GameField.cell_size * j)
-                self.frames.append(sheet.subsurface(pygame.Rect(frame_location, self.rect.size)))
+        self.frames, self.frames_masks, self.image, self.mask, self.animation_state = [], [], None, None, -1
+        if sprites_sheet is not None:
+            self.cut_sheet(sprites_sheet)
+
+    def cut_sheet(self, sprites_sheet: str) -> None:
+        """Prepares animation frames shared by all pacmans using given sheet"""
+        self.frames = core.get_frames(sprites_sheet, self.rect.size)
+        self.frames_masks = [core.get_mask(frame) for frame in self.frames]
         self.animation_state = -1
-        self.image = self.frames[Pacman.direction_frames_indexes[self.current_direction]]
+        self.set_frame(Pacman.direction_frames_indexes[self.current_direction])
+
+    def set_frame(self, frame_index: int) -> None:
+        self.image, self.mask = self.frames[frame_index], self.frames_masks[frame_index]
 
     def change_direction(self, direction: str) -> None:
         if direction not in [core.DIR_UP, core.DIR_DOWN, core.DIR_LEFT, core.DIR_RIGHT]:
             raise ValueError("Incorrect direction given")
         self.next_direction = direction
+        # decision points depend on awaited direction, so way is found again on the next move
+        self.way = None
 
     def move(self, ticks_passed: int) -> None:
-        """Moves pacman by given milliseconds passed from last frame processed"""
+        """Moves pacman by given milliseconds passed from last frame processed
+        Along way found by find_way pacman goes without checking walls and pellets are checked only
+        when the nearest one ahead is reached, until way end is passed or direction is changed"""
         self.ticks_passed += ticks_passed
         if self.ticks_passed < Pacman.ticks_to_move_1_px:
             return
 
+        distance = self.ticks_passed // Pacman.ticks_to_move_1_px
+        if self.way is not None:
+            axis, sign, end_cord, to_wall = self.way
+            cord = self.current_cords[axis]
+            along = cord + sign * distance
+            if to_wall and (end_cord - along) * sign < 0:
+                along = end_cord
+            if (end_cord - along) * sign >= 0:
+                if along == cord and self.next_direction is None:
+                    # pacman stands at wall and waits for direction
+                    self.ticks_passed %= Pacman.ticks_to_move_1_px
+                    return
+                start_cell = get_indexes_by_cords(*self.current_cords)
+                self.current_cords[axis] = along
+                self.rect.x, self.rect.y = self.current_cords[0] + self.game_field.shift_x, \
+                    self.current_cords[1] + self.game_field.shift_y
+                if along != cord:
+                    self.update_animation(ticks_passed)
+                    self.update_game_field_shift(self.ticks_passed)
+                self.ticks_passed %= Pacman.ticks_to_move_1_px
+                if self.pellet_cord is not None and (along - self.pellet_cord) * sign >= 0:
+                    self.check_pellets(start_cell)
+                    self.pellet_cord = self.get_pellet_cord()
+                return
+            self.way = None
+
+        start_cell = get_indexes_by_cords(*self.current_cords)
         distance_to_wall = self.game_field.min_distance_to_wall(self.current_direction, *self.current_cords)
         if distance_to_wall == 0 and self.next_direction is None:
             self.ticks_passed %= Pacman.ticks_to_move_1_px
+            self.find_way(0)
             return
 
         if self.next_direction is not None:
@@ -78,67 +139,88 @@ class Pacman(pygame.sprite.Sprite):
                 self.current_direction = self.next_direction
                 distance_to_wall = next_distance
 
-        self.current_cords = new_cords(self.current_cords, self.current_direction, distance_to_wall,
-                                       self.ticks_passed // Pacman.ticks_to_move_1_px)
+        self.current_cords = new_cords(self.current_cords, self.current_direction, distance_to_wall, distance)
         self.rect.x, self.rect.y = self.current_cords[0] + self.game_field.shift_x,\
             self.current_cords[1] + self.game_field.shift_y
         if distance_to_wall > 0:
             self.update_animation(ticks_passed)
             self.update_game_field_shift(self.ticks_passed)
         self.ticks_passed %= Pacman.ticks_to_move_1_px
-        self.check_pellets()
-        self.ex_cell = get_indexes_by_cords(*self.current_cords)
+        self.check_pellets(start_cell)
+        self.find_way(distance_to_wall - min(distance_to_wall, distance))
+
+    def find_way(self, distance_to_wall: int) -> None:
+        """Finds way pacman follows until next decision: straight to wall given distance away if it goes on
+        in current direction, or to exit of straight corridor if it waits to turn aside"""
+        if self.next_direction is None or self.next_direction == self.current_direction:
+            axis = 0 if self.current_direction in (core.DIR_LEFT, core.DIR_RIGHT) else 1
+            sign = -1 if self.current_direction in (core.DIR_LEFT, core.DIR_UP) else 1
+            self.way = axis, sign, self.current_cords[axis] + sign * distance_to_wall, True
+        elif core.is_opposite(self.next_direction, self.current_direction):
+            # pacman could not turn back, so it is checked every move
+            self.way = None
+        else:
+            corridor_way = get_corridor_way(self)
+            self.way = None if corridor_way is None else (*corridor_way, False)
+        if self.way is not None:
+            self.pellet_cord = self.get_pellet_cord()
 
     def update_animation(self, ticks_passed: int) -> None:
         """Changes pacman current shown sprite"""
         self.animation_ticks_passed += ticks_passed
-        if self.animation_ticks_passed < Pacman.ticks_to_update_animation:
+        if not self.frames or self.animation_ticks_passed < Pacman.ticks_to_update_animation:
             return
 
         self.animation_state = (self.animation_state + 1) % (len(self.frames) // 4)
-        self.image = self.frames[self.animation_state + Pacman.direction_frames_indexes[self.current_direction]]
+        self.set_frame(self.animation_state + Pacman.direction_frames_indexes[self.current_direction])
         self.animation_ticks_passed %= Pacman.ticks_to_update_animation
 
     def update_game_field_shift(self, ticks_passed: int) -> None:
         self.game_field.update_shift(self.current_direction, ticks_passed // Ghost.ticks_to_move_1_px)
 
-    def check_pellets(self) -> None:
-        """Eat all pellets which are placed along pacman move"""
-        start_row, start_col = self.ex_cell
+    def get_pellet_cord(self) -> int | None:
+        """Returns cord along way at which pacman eats the nearest pellet ahead,
+        None if there are no pellets up to way end"""
+        axis, sign, exit_cord, _ = self.way
+        cell_size, width = GameField.cell_size, self.game_field.width
+        row, col = get_indexes_by_cords(*self.current_cords)
+        cell = col if axis == 0 else row
+        # the last cell which pellet is eaten before way end is passed
+        exit_cell = (exit_cord + cell_size + 1) // cell_size - 1 if sign > 0 else (exit_cord - 1) // cell_size + 1
+        low_cell, high_cell = min(cell, exit_cell), max(cell, exit_cell)
+        if axis == 0:
+            cells = self.game_field.live_pellets[row * width + low_cell:row * width + high_cell + 1]
+        else:
+            cells = self.game_field.live_pellets[low_cell * width + col:high_cell * width + col + 1:width]
+        if sign > 0:
+            offset = len(cells) - len(cells.lstrip(b'\x00'))
+            return (low_cell + offset) * cell_size - 1 if offset < len(cells) else None
+        offset = len(cells.rstrip(b'\x00')) - 1
+        return (low_cell + offset) * cell_size if offset >= 0 else None
+
+    def check_pellets(self, start_cell: tuple[int, int]) -> None:
+        """Eat all pellets which are placed along pacman move started in given cell"""
+        start_row, start_col = start_cell
         object_row, object_col = get_indexes_by_cords(*self.current_cords)
-
+        width = self.game_field.width
         if self.current_direction == core.DIR_UP:
-
             end_row = get_indexes_by_cords(self.current_cords[0], self.current_cords[1] - 1)[0]
-            for row in range(start_row, end_row, -1):
-                pellet = self.game_field.pellets[row][object_col]
-                if pellet is not None and not pellet.is_eaten():
-                    self.eat_pellet(pellet)
+            indexes = range(start_row * width + object_col, end_row * width + object_col, -width)
         elif self.current_direction == core.DIR_DOWN:
             end_row = get_indexes_by_cords(self.current_cords[0], self.current_cords[1] + GameField.cell_size + 1)[0]
-            for row in range(start_row, end_row):
-                pellet = self.game_field.pellets[row][object_col]
-                if pellet is not None and not pellet.is_eaten():
-                    self.eat_pellet(pellet)
+            indexes = range(start_row * width + object_col, end_row * width + object_col, width)
         elif self.current_direction == core.DIR_LEFT:
             end_col = get_indexes_by_cords(self.current_cords[0] - 1, self.current_cords[1])[1]
-            for col in range(start_col, end_col, -1):
-                pellet = self.game_field.pellets[object_row][col]
-                if pellet is not None and not pellet.is_eaten():
-                    self.eat_pellet(pellet)
-        elif self.current_direction == core.DIR_RIGHT:
+            indexes = range(object_row * width + start_col, object_row * width + end_col, -1)
+        else:
             end_col = get_indexes_by_cords(self.current_cords[0] + GameField.cell_size + 1, self.current_cords[1])[1]
-            for col in range(start_col, end_col):
-                pellet = self.game_field.pellets[object_row][col]
-                if pellet is not None and not pellet.is_eaten():
-                    self.eat_pellet(pellet)
-
-    def eat_pellet(self, pellet: Pellet) -> None:
-        if pellet.is_eaten():
-            return
+            indexes = range(object_row * width + start_col, object_row * width + end_col)
+        for pellet in self.game_field.eat_pellets(indexes):
+            self.add_pellet(pellet)
 
+    def add_pellet(self, pellet) -> None:
+        """Adds value of eaten pellet to score and turns on magic state for magic one"""
         self.current_score += pellet.get_value()
-        pellet.set_eaten(True)
         if pellet.is_magic():
             self.game_field.set_magic_state()
 
@@ -154,17 +236,31 @@ class Ghost(pygame.sprite.Sprite):
     ticks_to_move_1_px = 9
     ticks_to_end_magic_state = 20_000
 
-    def __init__(self, start_cords: list[int, int], game_field: GameField) -> None:
+    def __init__(self, start_cords: list[int, int], game_field: GameField, load_images: bool = True,
+                 rng: random.Random = random, chase_mode: bool = False) -> None:
+        """Random decisions are taken from given rng, global random module is used by default
+        In chase mode ghost follows distance field from pacman instead of wandering randomly"""
         super().__init__()
         self.game_field = game_field
+        self.rng = rng
+        self.chase_mode = chase_mode
+        self.last_decision_cords = None
+        # straight way ghost follows without looking for ways, see get_corridor_way,
+        # in chase mode it ends at the border of cell ghost moves into
+        self.way = None
         self.ticks_passed = 0
         self.last_cell_processed = None
         self.current_direction = core.DIR_UP
         self.current_cords = start_cords.copy()
-        self.regular_image = core.load_image("ghost.png")
-        self.blue_image = core.load_image("ghost_blue.png")
-        self.image = self.regular_image
-        self.rect = self.image.get_rect()
+        if load_images:
+            self.regular_image = core.get_image("ghost.png")
+            self.blue_image = core.get_image("ghost_blue.png")
+            self.regular_mask = core.get_mask(self.regular_image)
+            self.blue_mask = core.get_mask(self.blue_image)
+        else:
+            self.regular_image = self.blue_image = self.regular_mask = self.blue_mask = None
+        self.image, self.mask = self.regular_image, self.regular_mask
+        self.rect = pygame.Rect(0, 0, GameField.cell_size, GameField.cell_size)
         self.rect.x, self.rect.y = start_cords
         self.start_cords = start_cords
         self.magic_state = False
@@ -172,48 +268,129 @@ class Ghost(pygame.sprite.Sprite):
 
     def get_random_way(self) -> tuple[str, int]:
         """Returns random available way which is tuple of direction and distance to wall"""
-        possible_ways = []
-        for direction in Ghost.directions:
-            distance = self.game_field.min_distance_to_wall(direction, *self.current_cords)
-            if distance > 0:
-                possible_ways.append((direction, distance))
-        if len(possible_ways) == 1:
-            return possible_ways[0]
-        return random.choice([way for way in possible_ways if not core.is_opposite(way[0], self.current_direction)])
+        distances = {direction: self.game_field.min_distance_to_wall(direction, *self.current_cords)
+                     for direction in Ghost.directions}
+        possible_directions = [direction for direction in Ghost.directions if distances[direction] > 0]
+        direction = choose_direction(self.rng, possible_directions, core.get_opposite(self.current_direction))
+        return direction, distances[direction]
 
     def get_way_to_pacman(self, pacman: Pacman):
         """Returns direction to reach pacman if it is possible else None"""
         self_x, self_y = self.current_cords
         pacman_x, pacman_y = pacman.get_cords()
+        if self_x != pacman_x and self_y != pacman_y:
+            return None
+
         for direction in Ghost.directions:
-            distance_to_wall = self.game_field.min_distance_to_wall(direction, self_x, self_y)
             if direction == core.DIR_LEFT:
                 distance_to_pacman = self_x - (pacman_x + GameField.cell_size)
-                if self_y == pacman_y and 0 <= distance_to_pacman <= distance_to_wall:
-                    return direction
+                aligned = self_y == pacman_y
             elif direction == core.DIR_RIGHT:
                 distance_to_pacman = pacman_x - (self_x + GameField.cell_size)
-                if self_y == pacman_y and 0 <= distance_to_pacman <= distance_to_wall:
-                    return direction
+                aligned = self_y == pacman_y
             elif direction == core.DIR_UP:
                 distance_to_pacman = self_y - (pacman_y + GameField.cell_size)
-                if self_x == pacman_x and 0 <= distance_to_pacman <= distance_to_wall:
-                    return direction
-            elif direction == core.DIR_DOWN:
+                aligned = self_x == pacman_x
+            else:
                 distance_to_pacman = pacman_y - (self_y + GameField.cell_size)
-                if self_x == pacman_x and 0 <= distance_to_pacman <= distance_to_wall:
-                    return direction
+                aligned = self_x == pacman_x
+            if aligned and 0 <= distance_to_pacman <= \
+                    self.game_field.min_distance_to_wall(direction, self_x, self_y):
+                return direction
         return None
 
+    def get_flow_way(self) -> tuple[str, int]:
+        """Returns way which is tuple of direction and distance to the nearest cell border
+        Ghost turns only at cell aligned positions, to the neighbour cell closest to pacman
+        or the farthest one in magic state"""
+        x, y = self.current_cords
+        cell_size = GameField.cell_size
+        distance_to_wall = self.game_field.min_distance_to_wall(self.current_direction, x, y)
+        if x % cell_size or y % cell_size or self.last_decision_cords == (x, y) and distance_to_wall > 0:
+            direction = self.current_direction
+        else:
+            self.last_decision_cords = x, y
+            distance_field, width = self.game_field.get_pacman_distance_field(), self.game_field.width
+            row, col = get_indexes_by_cords(x, y)
+            best_way, best_score = None, None
+            for direction in Ghost.directions:
+                distance = self.game_field.min_distance_to_wall(direction, x, y)
+                row_shift, col_shift = core.cells_shifts[direction]
+                steps = distance_field[(row + row_shift) * width + col + col_shift] if distance > 0 else -1
+                if steps < 0:
+                    continue
+                score = -steps if self.magic_state else steps
+                if best_score is None or score < best_score or \
+                        score == best_score and direction == self.current_direction:
+                    best_way, best_score = (direction, distance), score
+            if best_way is None:
+                return self.get_random_way()
+            direction, distance_to_wall = best_way
+
+        if distance_to_wall == 0:
+            return self.get_random_way()
+        if direction in (core.DIR_LEFT, core.DIR_RIGHT):
+            offset = x % cell_size
+        else:
+            offset = y % cell_size
+        if direction in (core.DIR_LEFT, core.DIR_UP):
+            distance_to_border = offset or cell_size
+        else:
+            distance_to_border = cell_size - offset
+        return direction, min(distance_to_wall, distance_to_border)
+
+    def get_cell_way(self) -> tuple[int, int, int] | None:
+        """Returns way of ghost in chase mode to the border of cell it moves into, where it decides again,
+        None if ghost is at cell border or meets wall before it"""
+        cell_size = GameField.cell_size
+        axis = 0 if self.current_direction in (core.DIR_LEFT, core.DIR_RIGHT) else 1
+        along = self.current_cords[axis]
+        if along % cell_size == 0:
+            return None
+        if self.current_direction in (core.DIR_LEFT, core.DIR_UP):
+            sign, border = -1, along - along % cell_size
+        else:
+            sign, border = 1, along - along % cell_size + cell_size
+        if self.game_field.min_distance_to_wall(self.current_direction, *self.current_cords) < abs(border - along):
+            return None
+        return axis, sign, border
+
     def move(self, ticks_passed: int, pacman: Pacman) -> None:
-        """Moves ghost by given milliseconds passed from last frame processed"""
+        """Moves ghost by given milliseconds passed from last frame processed
+        On straight way ghost neither looks for ways nor checks walls until it reaches way end
+        or sees pacman"""
         self.ticks_passed += ticks_passed
         if self.ticks_passed < Ghost.ticks_to_move_1_px:
             return
 
+        distance = self.ticks_passed // Ghost.ticks_to_move_1_px
+        if self.way is not None:
+            axis, sign, end_cord = self.way
+            x, y = self.current_cords
+            pacman_x, pacman_y = pacman.get_cords()
+            along = self.current_cords[axis] + sign * distance
+            # pacman may be seen only from the same row or column, see get_way_to_pacman
+            if (end_cord - along) * sign >= 0 and (self.chase_mode or x != pacman_x and y != pacman_y):
+                cell = self.current_cords[axis] // GameField.cell_size
+                if cell != self.last_cell_processed[1 - axis]:
+                    if not self.chase_mode:
+                        # random way is chosen in every new cell, in corridor it is always forward
+                        choose_direction(self.rng, CORRIDOR_DIRECTIONS[axis], core.get_opposite(self.current_direction))
+                    self.last_cell_processed = get_indexes_by_cords(x, y)
+                self.current_cords[axis] = along
+                self.rect.x, self.rect.y = self.current_cords[0] + self.game_field.shift_x, \
+                    self.current_cords[1] + self.game_field.shift_y
+                self.update_magic_state(ticks_passed)
+                self.update_animation()
+                self.ticks_passed %= Ghost.ticks_to_move_1_px
+                return
+            self.way = None
+
         cur_cell = get_indexes_by_cords(*self.current_cords)
-        way_to_pacman = self.get_way_to_pacman(pacman)
-        if way_to_pacman is not None:
+        way_to_pacman = None if self.chase_mode else self.get_way_to_pacman(pacman)
+        if self.chase_mode:
+            direction, distance_to_wall = self.get_flow_way()
+        elif way_to_pacman is not None:
             if self.magic_state:
                 direction = core.get_opposite(way_to_pacman)
             else:
@@ -228,25 +405,29 @@ class Ghost(pygame.sprite.Sprite):
             direction, distance_to_wall = self.get_random_way()
 
         self.current_direction = direction
-        self.current_cords = new_cords(self.current_cords, self.current_direction, distance_to_wall,
-                                       self.ticks_passed // Ghost.ticks_to_move_1_px)
+        self.current_cords = new_cords(self.current_cords, self.current_direction, distance_to_wall, distance)
         self.rect.x, self.rect.y = self.current_cords[0] + self.game_field.shift_x,\
             self.current_cords[1] + self.game_field.shift_y
         self.update_magic_state(ticks_passed)
         self.update_animation()
         self.ticks_passed %= Ghost.ticks_to_move_1_px
         self.last_cell_processed = cur_cell
+        self.way = self.get_cell_way() if self.chase_mode else get_corridor_way(self)
 
     def update_animation(self):
         """Changes ghost current shown sprite"""
+        if self.regular_image is None:
+            return
         if self.magic_state:
-            self.image = self.blue_image
+            self.image, self.mask = self.blue_image, self.blue_mask
         else:
-            self.image = self.regular_image
+            self.image, self.mask = self.regular_image, self.regular_mask
 
     def reset_position(self):
         self.current_cords = self.start_cords.copy()
         self.magic_state = False
+        self.last_decision_cords = None
+        self.way = None
 
     def set_magic_state(self, new_state: bool) -> None:
         self.magic_state = new_state
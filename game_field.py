@@ -1,5 +1,11 @@
+from array import array
+from collections import OrderedDict
+
+import numpy as np
 import pygame
 
+from levels import Level, build_corridors, build_free_runs, parse_level_rows, read_level,\
+    WALL_CODES, MAX_SIDE_CELLS, CORRIDOR_HORIZONTAL, CORRIDOR_VERTICAL
 import core
 
 
@@ -9,37 +15,50 @@ def get_indexes_by_cords(x: int, y: int) -> tuple[int, int]:
 
 
 class Pellet:
-    def __init__(self, value: int = 10, magic: bool = False) -> None:
-        self.eaten = False
-        self.value = value
-        self.magic = magic
+    """Light view of pellet placed in certain cell of game field"""
+    __slots__ = ("game_field", "index")
+
+    def __init__(self, game_field: "GameField", index: int) -> None:
+        self.game_field = game_field
+        self.index = index
 
     def __repr__(self) -> str:
-        return str(self.eaten)
+        return str(self.is_eaten())
 
     def set_eaten(self, eaten: bool) -> None:
-        self.eaten = eaten
+        self.game_field.set_pellet_eaten(self.index, eaten)
 
     def is_eaten(self) -> bool:
-        return self.eaten
+        return not self.game_field.live_pellets[self.index]
 
     def is_magic(self) -> bool:
-        return self.magic
+        return self.game_field.cells[self.index] == GameField.magic_pellet_code
 
     def get_value(self) -> int:
-        return self.value
+        return 0 if self.is_magic() else GameField.pellet_value
 
 
 class GameField:
     cell_size, cell_border_width = 40, 1
+    chunk_cells, chunks_memory_budget = 16, 64 * 1024 * 1024
     standard_screen_size = 800, 800
     wall_border_color, cell_border_color = "blue", (63, 63, 252)
     pellet_color, pellet_radius = "yellow", 5
     magic_pellet_color, magic_pellet_radius = "yellow", 12
+    pellet_value = 10
+    wall_codes, pellet_code, magic_pellet_code = WALL_CODES, ord(' '), ord('$')
+    max_side_cells = MAX_SIDE_CELLS
+    # maps every cell code to 1 if there is pellet in cell on level start else to 0
+    pellets_table = bytes(int(code in b" $") for code in range(256))
 
     def __init__(self) -> None:
         self.pygame_screen = None
-        self.field_scheme = None
+        self.cells = None
+        self.pacman = None
+        # walls are pre-rendered lazily by square chunks of cells
+        self.walls_chunks = OrderedDict()
+        self.walls_chunks_key = None
+        self.walls_chunks_memory = 0
 
     def set_pygame_screen(self, pygame_screen: pygame.Surface) -> None:
         self.pygame_screen = pygame_screen
@@ -51,40 +70,69 @@ class GameField:
         self.ghosts = ghosts
 
     def load_map_scheme(self, scheme_file_name: str) -> None:
-        """Loads level design inside GameField object"""
-        with open(scheme_file_name, 'r', encoding="utf-8") as input_file:
-            data = input_file.read().split('\n')
-        if not data:
-            raise ValueError("Empty scheme file for game field")
+        """Loads level design inside GameField object from text scheme or compiled level file"""
+        self.load_level(read_level(scheme_file_name))
+
+    def set_map_scheme(self, data: list[str]) -> None:
+        """Loads level design from given scheme rows"""
+        self.load_level(parse_level_rows(data))
 
-        self.width, self.height = max(map(len, data)), len(data)
+    def load_level(self, level: Level) -> None:
+        """Loads already parsed level design"""
+        self.level = level
+        self.width, self.height = level.width, level.height
         self.screen_size = min(GameField.standard_screen_size[0], self.width * GameField.cell_size),\
             min(GameField.standard_screen_size[1], self.height * GameField.cell_size)
-        self.field_scheme = list(map(lambda x: x.ljust(self.width, '.'), data))
+        self.cells = level.cells
+        if level.free_runs is None:
+            level.free_runs = build_free_runs(self.width, self.height, self.cells)
+        self.free_runs = level.free_runs
+        if level.corridors is None:
+            level.corridors = build_corridors(self.width, self.height, self.cells)
+        self.corridors_types, self.corridors_runs = level.corridors
+        self.pellets_cells = None
+        self.walls_chunks_key = None
+        self.reset()
+
+    def reset(self) -> None:
+        """Returns all pellets and camera to level start state, level design is kept"""
         self.shift_x, self.shift_y = self.get_start_shifts()
-        self.pellets = []
-        for row in range(self.height):
-            current_row = []
-            for col in range(self.width):
-                if self.field_scheme[row][col] == ' ':
-                    current_row.append(Pellet())
-                elif self.field_scheme[row][col] == '$':
-                    current_row.append(Pellet(0, True))
-                else:
-                    current_row.append(None)
-            self.pellets.append(current_row)
+        self.live_pellets = bytearray(self.cells).translate(GameField.pellets_table)
+        self.pellets_left = self.level.pellets_count
+        self.pellets_eaten = 0
+        # flat indexes of cells which pellets were eaten or restored, in order of changes
+        # readers keep their own position in it, list is replaced on reset
+        self.pellets_log = []
+        self.distance_field, self.distance_field_cell = None, None
+
+    def get_cell(self, row: int, col: int) -> str:
+        """Returns symbol of level scheme placed in given cell"""
+        return chr(self.cells[row * self.width + col])
+
+    def get_pellet(self, row: int, col: int) -> Pellet | None:
+        """Returns pellet placed in given cell or None if cell has no pellet"""
+        index = row * self.width + col
+        if not GameField.pellets_table[self.cells[index]]:
+            return None
+        return Pellet(self, index)
+
+    def get_pellets_cells(self) -> np.ndarray:
+        """Returns flat indexes of cells which have pellets on level start"""
+        if self.pellets_cells is None:
+            self.pellets_cells = np.flatnonzero(np.frombuffer(bytes(self.cells).translate(GameField.pellets_table),
+                                                              dtype=np.uint8))
+        return self.pellets_cells
 
     def get_ghosts_cells(self) -> list[tuple[int, int]]:
         """Returns list of indexes of cells where ghosts are located before game start moment"""
-        return [(row, col) for col in range(self.width) for row in range(self.height)
-                if self.field_scheme[row][col] == '@']
+        return list(self.level.ghosts_cells)
 
     def get_pacman_cords(self) -> list[int, int]:
         """Returns indexes of cell where pacman is located before game start moment"""
-        for row in range(self.height):
-            for col in range(self.width):
-                if self.field_scheme[row][col] == '%':
-                    return [col * GameField.cell_size, row * GameField.cell_size]
+        if self.level.pacman_cell is None:
+            return None
+        row, col = self.level.pacman_cell
+        return [col * GameField.cell_size, row * GameField.cell_size]
 
     def get_start_shifts(self) -> tuple[int, int]:
         """Returns start shift for camera to be places nicely"""
@@ -97,114 +145,267 @@ class GameField:
 
     def get_screen_size(self) -> tuple[int, int]:
         """Returns size for pygame screen"""
-        if self.field_scheme is None:
+        if self.cells is None:
             raise RuntimeError("Screen is not set yet")
         return self.screen_size
 
     def distance_to_wall(self, direction: str, object_x: int, object_y: int) -> int:
         """Returns distance to wall in pixels for certain given point and direction"""
         object_row, object_col = get_indexes_by_cords(object_x, object_y)
-        result = 0
+        result = self.free_runs[direction][object_row * self.width + object_col]
         if direction == core.DIR_LEFT:
-            for col in range(object_col, -1, -1):
-                if self.field_scheme[object_row][col] not in "*#":
-                    result += 1
-                else:
-                    break
             return max(0, object_x - GameField.cell_size * (object_col - result + 1))
         elif direction == core.DIR_RIGHT:
-            for col in range(object_col, self.width):
-                if self.field_scheme[object_row][col] not in "*#":
-                    result += 1
-                else:
-                    break
             return max(0, GameField.cell_size * (object_col + result + 1) - object_x - GameField.cell_size - 1)
         elif direction == core.DIR_UP:
-            for row in range(object_row, -1, -1):
-                if self.field_scheme[row][object_col] not in "*#":
-                    result += 1
-                else:
-                    break
             return max(0, object_y - GameField.cell_size * (object_row - result + 1))
         elif direction == core.DIR_DOWN:
-            for row in range(object_row, self.height):
-                if self.field_scheme[row][object_col] not in "*#":
-                    result += 1
-                else:
-                    break
             return max(0, GameField.cell_size * (object_row + result + 1) - object_y - GameField.cell_size - 1)
 
     def min_distance_to_wall(self, direction: str, object_x: int, object_y: int) -> int:
         """Returns distance to wall in pixels for object by it`s given left upper angle and direction"""
-        packman_rectangle_vertexes = [(object_x, object_y), (object_x + GameField.cell_size - 1, object_y),
-                                      (object_x, object_y + GameField.cell_size - 1),
-                                      (object_x + GameField.cell_size - 1, object_y + GameField.cell_size - 1)]
-        return min(self.distance_to_wall(direction, *vertex) for vertex in packman_rectangle_vertexes)
+        # same as minimum of distance_to_wall for all four object rectangle vertexes, but inlined
+        # because it is called for every entity on every tick
+        cell_size, width, runs = GameField.cell_size, self.width, self.free_runs[direction]
+        far_x, far_y = object_x + cell_size - 1, object_y + cell_size - 1
+        near_row, near_col, far_row, far_col = object_y // cell_size, object_x // cell_size,\
+            far_y // cell_size, far_x // cell_size
+        near_row_start, far_row_start = near_row * width, far_row * width
+        if direction == core.DIR_LEFT:
+            near_run = min(runs[near_row_start + near_col], runs[far_row_start + near_col])
+            far_run = min(runs[near_row_start + far_col], runs[far_row_start + far_col])
+            return max(0, min(object_x - cell_size * (near_col - near_run + 1),
+                              far_x - cell_size * (far_col - far_run + 1)))
+        elif direction == core.DIR_RIGHT:
+            near_run = min(runs[near_row_start + near_col], runs[far_row_start + near_col])
+            far_run = min(runs[near_row_start + far_col], runs[far_row_start + far_col])
+            return max(0, min(cell_size * (near_col + near_run) - object_x - 1,
+                              cell_size * (far_col + far_run) - far_x - 1))
+        elif direction == core.DIR_UP:
+            near_run = min(runs[near_row_start + near_col], runs[near_row_start + far_col])
+            far_run = min(runs[far_row_start + near_col], runs[far_row_start + far_col])
+            return max(0, min(object_y - cell_size * (near_row - near_run + 1),
+                              far_y - cell_size * (far_row - far_run + 1)))
+        elif direction == core.DIR_DOWN:
+            near_run = min(runs[near_row_start + near_col], runs[near_row_start + far_col])
+            far_run = min(runs[far_row_start + near_col], runs[far_row_start + far_col])
+            return max(0, min(cell_size * (near_row + near_run) - object_y - 1,
+                              cell_size * (far_row + far_run) - far_y - 1))
 
-    def render(self) -> None:
-        if self.field_scheme is None or self.pygame_screen is None:
-            raise RuntimeError("Unable to render game field, because field scheme or"
-                               "pygame screen are not set")
+    def get_corridor(self, direction: str, object_x: int, object_y: int) -> tuple[bool, int, int, int] | None:
+        """Returns straight corridor along direction axis which object with given left upper angle is in,
+        or None if object is not in one, there object can neither turn nor meet wall until it is at junction
+        Corridor is tuple of whether it is horizontal, object cord across it and range of object cord along it,
+        which is up to junctions at both ends, but not including them"""
+        cell_size, width = GameField.cell_size, self.width
+        if direction in (core.DIR_LEFT, core.DIR_RIGHT):
+            across, along, corridor_type, step = object_y, object_x, CORRIDOR_HORIZONTAL, 1
+            back_runs, forward_runs = self.corridors_runs[core.DIR_LEFT], self.corridors_runs[core.DIR_RIGHT]
+        else:
+            across, along, corridor_type, step = object_x, object_y, CORRIDOR_VERTICAL, width
+            back_runs, forward_runs = self.corridors_runs[core.DIR_UP], self.corridors_runs[core.DIR_DOWN]
+        if across % cell_size:
+            return None
+
+        start_index = object_y // cell_size * width + object_x // cell_size
+        # object covers one cell or two neighbour ones, at least one of them has to be in corridor
+        index = start_index if along % cell_size == 0 or self.corridors_types[start_index] == corridor_type \
+            else start_index + step
+        if self.corridors_types[index] != corridor_type:
+            return None
+        cell = along // cell_size + (index != start_index)
+        return corridor_type == CORRIDOR_HORIZONTAL, across, cell_size * (cell - back_runs[index] - 1) + 1,\
+            cell_size * (cell + forward_runs[index] + 1) - 1
+
+    def build_walls_chunk(self, chunk_row: int, chunk_col: int) -> pygame.Surface:
+        """Draws static walls of given chunk of the level into separate surface"""
+        cell_size, chunk_cells = GameField.cell_size, GameField.chunk_cells
+        first_row, first_col = chunk_row * chunk_cells, chunk_col * chunk_cells
+        last_row, last_col = min(self.height, first_row + chunk_cells), min(self.width, first_col + chunk_cells)
+        surface = pygame.Surface(((last_col - first_col) * cell_size, (last_row - first_row) * cell_size))
+        surface.fill("black")
 
         # drawing rectangles like walls borders
-        shift_x, shift_y = self.shift_x, self.shift_y
-        for row in range(len(self.field_scheme)):
-            for col in range(len(self.field_scheme[row])):
-                if self.field_scheme[row][col] == '#':
-                    pygame.draw.rect(self.pygame_screen, GameField.wall_border_color,
-                                     (GameField.cell_size * col + shift_x, GameField.cell_size * row + shift_y,
-                                      GameField.cell_size, GameField.cell_size))
-                elif self.field_scheme[row][col] == '*':
-                    pygame.draw.rect(self.pygame_screen, GameField.cell_border_color,
-                                     (GameField.cell_size * col + shift_x, GameField.cell_size * row + shift_y,
-                                      GameField.cell_size, GameField.cell_size),
+        for row in range(first_row, last_row):
+            for col in range(first_col, last_col):
+                cell = self.get_cell(row, col)
+                x, y = cell_size * (col - first_col), cell_size * (row - first_row)
+                if cell == '#':
+                    pygame.draw.rect(surface, GameField.wall_border_color, (x, y, cell_size, cell_size))
+                elif cell == '*':
+                    pygame.draw.rect(surface, GameField.cell_border_color, (x, y, cell_size, cell_size),
                                      GameField.cell_border_width)
-        # deleting borders between neighbour wall cells
-        for row in range(len(self.field_scheme)):
-            for col in range(len(self.field_scheme[row])):
-                if not self.field_scheme[row][col] == '*':
+        # deleting borders between neighbour wall cells, lines are inside of cell, so neighbours may be in other chunk
+        for row in range(first_row, last_row):
+            for col in range(first_col, last_col):
+                if not self.get_cell(row, col) == '*':
+                    continue
+
+                x, y = cell_size * (col - first_col), cell_size * (row - first_row)
+                if col > 0 and self.get_cell(row, col - 1) == '*':
+                    pygame.draw.line(surface, "black", (x, y + 1), (x, y + cell_size - 2))
+                if col < self.width - 1 and self.get_cell(row, col + 1) == '*':
+                    pygame.draw.line(surface, "black", (x + cell_size - 1, y + 1),
+                                     (x + cell_size - 1, y + cell_size - 2), 1)
+                if row > 0 and self.get_cell(row - 1, col) == '*':
+                    pygame.draw.line(surface, "black", (x + 1, y), (x + cell_size - 2, y))
+                if row < self.height - 1 and self.get_cell(row + 1, col) == '*':
+                    pygame.draw.line(surface, "black", (x + 1, y + cell_size - 1),
+                                     (x + cell_size - 2, y + cell_size - 1), 1)
+        return surface
+
+    def get_walls_chunk(self, chunk_row: int, chunk_col: int) -> pygame.Surface:
+        """Returns cached walls chunk, the least recently used chunks are dropped when cache exceeds memory budget
+        Cache is cleared if field scheme or cell size were changed"""
+        cache_key = (id(self.cells), GameField.cell_size)
+        if self.walls_chunks_key != cache_key:
+            self.walls_chunks.clear()
+            self.walls_chunks_memory = 0
+            self.walls_chunks_key = cache_key
+
+        chunk = self.walls_chunks.get((chunk_row, chunk_col))
+        if chunk is not None:
+            self.walls_chunks.move_to_end((chunk_row, chunk_col))
+            return chunk
+
+        chunk = self.build_walls_chunk(chunk_row, chunk_col)
+        self.walls_chunks[chunk_row, chunk_col] = chunk
+        self.walls_chunks_memory += chunk.get_width() * chunk.get_height() * chunk.get_bytesize()
+        while self.walls_chunks_memory > GameField.chunks_memory_budget and len(self.walls_chunks) > 1:
+            _, dropped = self.walls_chunks.popitem(last=False)
+            self.walls_chunks_memory -= dropped.get_width() * dropped.get_height() * dropped.get_bytesize()
+        return chunk
+
+    def get_chunks_in_area(self, area: pygame.Rect, shift: tuple[int, int]) -> list[tuple[int, int]]:
+        """Returns indexes of walls chunks which are visible in given screen area"""
+        chunk_size = GameField.chunk_cells * GameField.cell_size
+        first_row = max(0, (area.top - shift[1]) // chunk_size)
+        first_col = max(0, (area.left - shift[0]) // chunk_size)
+        last_row = min((self.height - 1) // GameField.chunk_cells, (area.bottom - 1 - shift[1]) // chunk_size)
+        last_col = min((self.width - 1) // GameField.chunk_cells, (area.right - 1 - shift[0]) // chunk_size)
+        return [(row, col) for row in range(first_row, last_row + 1) for col in range(first_col, last_col + 1)]
+
+    def build_start_walls_chunks(self) -> None:
+        """Builds walls chunks which camera shows on level start, so first frame does not wait for them"""
+        for chunk_row, chunk_col in self.get_chunks_in_area(pygame.Rect((0, 0), self.screen_size),
+                                                            self.get_start_shifts()):
+            self.get_walls_chunk(chunk_row, chunk_col)
+
+    def prefetch_walls_chunks(self, direction: str, shift: tuple[int, int]) -> None:
+        """Builds chunks which camera will show after moving one chunk further in given direction"""
+        shift_row, shift_col = core.cells_shifts[direction]
+        chunk_size = GameField.chunk_cells * GameField.cell_size
+        area = pygame.Rect((0, 0), self.screen_size).move(shift_col * chunk_size, shift_row * chunk_size)
+        for chunk_row, chunk_col in self.get_chunks_in_area(area, shift):
+            if (chunk_row, chunk_col) not in self.walls_chunks:
+                self.get_walls_chunk(chunk_row, chunk_col)
+
+    def render(self, shift: tuple[int, int] | None = None) -> None:
+        """Draws game field with given camera shift, current one is used if it is not given
+        Walls chunks in direction of pacman movement are prepared in advance"""
+        shift = shift if shift is not None else (self.shift_x, self.shift_y)
+        self.render_area(pygame.Rect((0, 0), self.screen_size), shift)
+        if self.pacman is not None:
+            self.prefetch_walls_chunks(self.pacman.current_direction, shift)
+
+    def render_area(self, area: pygame.Rect, shift: tuple[int, int] | None = None) -> None:
+        """Draws only given screen area of game field with given camera shift"""
+        if self.cells is None or self.pygame_screen is None:
+            raise RuntimeError("Unable to render game field, because field scheme or"
+                               "pygame screen are not set")
+
+        shift_x, shift_y = shift if shift is not None else (self.shift_x, self.shift_y)
+        chunk_size = GameField.chunk_cells * GameField.cell_size
+        for chunk_row, chunk_col in self.get_chunks_in_area(area, (shift_x, shift_y)):
+            chunk_x, chunk_y = chunk_col * chunk_size + shift_x, chunk_row * chunk_size + shift_y
+            visible = area.clip(pygame.Rect(chunk_x, chunk_y, chunk_size, chunk_size))
+            self.pygame_screen.blit(self.get_walls_chunk(chunk_row, chunk_col), visible,
+                                    visible.move(-chunk_x, -chunk_y))
+
+        # drawing only pellets placed in cells visible in area
+        first_row, first_col = get_indexes_by_cords(area.left - shift_x, area.top - shift_y)
+        last_row, last_col = get_indexes_by_cords(area.right - 1 - shift_x, area.bottom - 1 - shift_y)
+        clip = self.pygame_screen.get_clip()
+        self.pygame_screen.set_clip(area.clip(clip))
+        for row in range(max(0, first_row), min(self.height - 1, last_row) + 1):
+            row_start = row * self.width
+            for col in range(max(0, first_col), min(self.width - 1, last_col) + 1):
+                if not self.live_pellets[row_start + col]:
                     continue
+                if self.cells[row_start + col] == GameField.magic_pellet_code:
+                    color, radius = GameField.magic_pellet_color, GameField.magic_pellet_radius
+                else:
+                    color, radius = GameField.pellet_color, GameField.pellet_radius
+                pygame.draw.circle(self.pygame_screen, color,
+                                   (GameField.cell_size * col + GameField.cell_size / 2 + shift_x,
+                                    GameField.cell_size * row + GameField.cell_size / 2 + shift_y), radius)
+        self.pygame_screen.set_clip(clip)
+
+    def set_pellet_eaten(self, index: int, eaten: bool) -> None:
+        """Sets eaten state of pellet placed in cell with given flat index"""
+        if not GameField.pellets_table[self.cells[index]] or eaten != bool(self.live_pellets[index]):
+            return
+
+        self.live_pellets[index] = not eaten
+        self.pellets_log.append(index)
+        self.pellets_eaten += 1 if eaten else -1
+        if self.cells[index] == GameField.pellet_code:
+            self.pellets_left += -1 if eaten else 1
 
-                if col > 0 and self.field_scheme[row][col - 1] == '*':
-                    pygame.draw.line(self.pygame_screen, "black",
-                                     (GameField.cell_size * col + shift_x,
-                                      GameField.cell_size * row + 1 + shift_y),
-                                     (GameField.cell_size * col + shift_x,
-                                      GameField.cell_size * (row + 1) - 2 + shift_y))
-                if col < len(self.field_scheme[row]) - 1 and self.field_scheme[row][col + 1] == '*':
-                    pygame.draw.line(self.pygame_screen, "black",
-                                     (GameField.cell_size * (col + 1) - 1 + shift_x,
-                                      GameField.cell_size * row + 1 + shift_y),
-                                     (GameField.cell_size * (col + 1) - 1 + shift_x,
-                                      GameField.cell_size * (row + 1) - 2 + shift_y), 1)
-                if row > 0 and self.field_scheme[row - 1][col] == '*':
-                    pygame.draw.line(self.pygame_screen, "black",
-                                     (GameField.cell_size * col + 1 + shift_x,
-                                      GameField.cell_size * row + shift_y),
-                                     (GameField.cell_size * (col + 1) - 2 + shift_x,
-                                      GameField.cell_size * row + shift_y))
-                if row < self.height - 1 and self.field_scheme[row + 1][col] == '*':
-                    pygame.draw.line(self.pygame_screen, "black",
-                                     (GameField.cell_size * col + 1 + shift_x,
-                                      GameField.cell_size * (row + 1) - 1 + shift_y),
-                                     (GameField.cell_size * (col + 1) - 2 + shift_x,
-                                      GameField.cell_size * (row + 1) - 1 + shift_y), 1)
-
-        for row in range(self.height):
-            for col in range(self.width):
-                cur_object = self.pellets[row][col]
-                if isinstance(cur_object, Pellet) and not cur_object.is_eaten():
-                    if cur_object.is_magic():
-                        color, radius = GameField.magic_pellet_color, GameField.magic_pellet_radius
-                    else:
-                        color, radius = GameField.pellet_color, GameField.pellet_radius
-                    pygame.draw.circle(self.pygame_screen, color,
-                                       (GameField.cell_size * col + GameField.cell_size / 2 + shift_x,
-                                        GameField.cell_size * row + GameField.cell_size / 2 + shift_y), radius)
+    def eat_pellet(self, row: int, col: int) -> Pellet | None:
+        """Marks pellet in given cell as eaten
+        Returns eaten pellet or None if there was nothing to eat"""
+        index = row * self.width + col
+        if not self.live_pellets[index]:
+            return None
+
+        self.set_pellet_eaten(index, True)
+        return Pellet(self, index)
+
+    def eat_pellets(self, indexes: range) -> list[Pellet]:
+        """Marks pellets in cells with given flat indexes as eaten, whole run is checked for pellets at once
+        Returns eaten pellets in order of indexes"""
+        stop = indexes.stop if indexes.stop >= 0 else None
+        if not any(self.live_pellets[indexes.start:stop:indexes.step]):
+            return []
+
+        eaten = []
+        for index in indexes:
+            if self.live_pellets[index]:
+                self.set_pellet_eaten(index, True)
+                eaten.append(Pellet(self, index))
+        return eaten
 
     def get_pellets_left(self) -> int:
-        return sum(bool(self.pellets[row][col].get_value()) for row in range(self.height) for col in range(self.width)
-                   if self.pellets[row][col] is not None and not self.pellets[row][col].is_eaten())
+        return self.pellets_left
+
+    def build_distance_field(self, row: int, col: int) -> array:
+        """Returns number of steps from given cell to every cell by flat index, -1 for unreachable cells"""
+        width, height, cells, wall_codes = self.width, self.height, self.cells, GameField.wall_codes
+        distances = array("i", [-1]) * (width * height)
+        start = row * width + col
+        distances[start] = 0
+        queue, queue_start = [start], 0
+        while queue_start < len(queue):
+            index = queue[queue_start]
+            queue_start += 1
+            next_distance = distances[index] + 1
+            index_col = index % width
+            for neighbour, exists in ((index - width, index >= width), (index + width, index < width * (height - 1)),
+                                      (index - 1, index_col > 0), (index + 1, index_col < width - 1)):
+                if exists and distances[neighbour] == -1 and cells[neighbour] not in wall_codes:
+                    distances[neighbour] = next_distance
+                    queue.append(neighbour)
+        return distances
+
+    def get_pacman_distance_field(self) -> array:
+        """Returns distance field from pacman cell shared by all ghosts, rebuilt only when pacman changes cell"""
+        x, y = self.pacman.get_cords()
+        pacman_cell = get_indexes_by_cords(x + GameField.cell_size // 2, y + GameField.cell_size // 2)
+        if pacman_cell != self.distance_field_cell:
+            self.distance_field = self.build_distance_field(*pacman_cell)
+            self.distance_field_cell = pacman_cell
+        return self.distance_field
 
     def set_magic_state(self) -> None:
         for ghost in self.ghosts:
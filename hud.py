@@ -0,0 +1,62 @@
+from collections import OrderedDict
+
+import pygame
+
+
+_fonts = {}
+
+
+def get_font(size: int) -> pygame.font.Font:
+    """Returns default font of given size, which is loaded once"""
+    if size not in _fonts:
+        _fonts[size] = pygame.font.Font(None, size)
+    return _fonts[size]
+
+
+class TextCache:
+    """Renders text of one font and color, whole rendered strings are cached,
+    the least recently used ones are dropped when there are too many"""
+
+    def __init__(self, size: int, color, max_strings: int = 64) -> None:
+        self.font = get_font(size)
+        self.color = pygame.Color(color)
+        self.max_strings = max_strings
+        self.strings = OrderedDict()
+
+    def render(self, text: str) -> pygame.Surface:
+        """Returns surface with given text, which is rendered by font only once while it is cached"""
+        if text in self.strings:
+            self.strings.move_to_end(text)
+            return self.strings[text]
+
+        surface = self.font.render(text, True, self.color)
+        self.strings[text] = surface
+        if len(self.strings) > self.max_strings:
+            self.strings.popitem(last=False)
+        return surface
+
+
+class ScoreHud:
+    """Pacman score in the top left corner, surface is rebuilt only when score changes"""
+    font_size, color = 50, (100, 255, 100)
+
+    def __init__(self) -> None:
+        self.text_cache = TextCache(ScoreHud.font_size, ScoreHud.color)
+        self.score = None
+        self.surface = None
+
+    def update(self, score: int) -> bool:
+        """Rebuilds surface if score was changed
+        Returns True if it was changed"""
+        if score == self.score:
+            return False
+        self.score = score
+        self.surface = self.text_cache.render("Score: " + str(score))
+        return True
+
+    def get_rect(self) -> pygame.Rect:
+        return self.surface.get_rect()
+
+    def draw(self, screen: pygame.Surface, score: int) -> None:
+        self.update(score)
+        screen.blit(self.surface, (0, 0))
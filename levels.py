@@ -0,0 +1,205 @@
+import argparse
+import mmap
+import struct
+import sys
+from array import array
+
+import numpy as np
+
+import core
+
+
+WALL_CODES = b"*#"
+MAX_SIDE_CELLS = 65535
+COMPILED_LEVEL_MAGIC, COMPILED_LEVEL_VERSION = b"PACL", 1
+FLAG_FREE_RUNS = 1
+# magic, version, flags, width, height, pacman row and col (-1 if none), ghosts count, pellets, magic pellets
+HEADER = struct.Struct("<4sHHIIiiIII")
+GHOST_CELL = struct.Struct("<II")
+FREE_RUNS_DIRECTIONS = [core.DIR_LEFT, core.DIR_RIGHT, core.DIR_UP, core.DIR_DOWN]
+# cell types in corridors table, junctions are free cells which are not straight corridor
+CORRIDOR_NONE, CORRIDOR_HORIZONTAL, CORRIDOR_VERTICAL = 0, 1, 2
+
+
+class Level:
+    """Parsed level design: cells codes by flat index, spawn points and pellets counts"""
+
+    def __init__(self, width: int, height: int, cells, pacman_cell: tuple[int, int] | None,
+                 ghosts_cells: list[tuple[int, int]], pellets_count: int, magic_pellets_count: int,
+                 free_runs: dict | None = None, buffer: mmap.mmap | None = None) -> None:
+        if max(width, height) > MAX_SIDE_CELLS:
+            raise ValueError(f"Game field can not be larger than {MAX_SIDE_CELLS} cells by side")
+        self.width, self.height = width, height
+        self.cells = cells
+        self.pacman_cell = pacman_cell
+        self.ghosts_cells = ghosts_cells
+        self.pellets_count, self.magic_pellets_count = pellets_count, magic_pellets_count
+        self.free_runs = free_runs
+        # straight corridors cells types and runs, built when level is loaded into game field
+        self.corridors = None
+        # memory mapped file which cells and free runs are views of, kept open while level is used
+        self.buffer = buffer
+
+
+def build_free_runs(width: int, height: int, cells) -> dict[str, array]:
+    """Returns for every direction and cell flat index number of free cells in a row up to wall,
+    cell itself included"""
+    left, right = array("H", bytes(2 * width * height)), array("H", bytes(2 * width * height))
+    up, down = array("H", bytes(2 * width * height)), array("H", bytes(2 * width * height))
+    for row in range(height):
+        row_start = row * width
+        run = 0
+        for index in range(row_start, row_start + width):
+            run = 0 if cells[index] in WALL_CODES else run + 1
+            left[index] = run
+        run = 0
+        for index in range(row_start + width - 1, row_start - 1, -1):
+            run = 0 if cells[index] in WALL_CODES else run + 1
+            right[index] = run
+    for col in range(width):
+        run = 0
+        for index in range(col, width * height, width):
+            run = 0 if cells[index] in WALL_CODES else run + 1
+            up[index] = run
+        run = 0
+        for index in range(col + width * (height - 1), -1, -width):
+            run = 0 if cells[index] in WALL_CODES else run + 1
+            down[index] = run
+    return {core.DIR_LEFT: left, core.DIR_RIGHT: right, core.DIR_UP: up, core.DIR_DOWN: down}
+
+
+def count_runs(mask: np.ndarray) -> np.ndarray:
+    """Returns for every element of boolean array number of consecutive True elements right after it in its row"""
+    height, width = mask.shape
+    positions = np.broadcast_to(np.arange(width, dtype=np.int32), (height, width))
+    # position of the nearest False element at or after every element, width if there is none
+    stops = np.where(mask, np.int32(width), positions)
+    stops = np.minimum.accumulate(stops[:, ::-1], axis=1)[:, ::-1]
+    runs = np.zeros((height, width), dtype=np.int32)
+    runs[:, :-1] = stops[:, 1:] - positions[:, 1:]
+    return runs
+
+
+def build_corridors(width: int, height: int, cells) -> tuple[bytes, dict[str, array]]:
+    """Returns type of every cell: horizontal or vertical straight corridor, which has free cells only at both
+    its ends, or none, and for every direction and cell number of cells of the same corridor right after it"""
+    free = np.zeros((height + 2, width + 2), dtype=bool)
+    free[1:-1, 1:-1] = ~np.isin(np.frombuffer(cells, dtype=np.uint8), list(WALL_CODES)).reshape(height, width)
+    center, up, down = free[1:-1, 1:-1], free[:-2, 1:-1], free[2:, 1:-1]
+    left, right = free[1:-1, :-2], free[1:-1, 2:]
+    horizontal = center & left & right & ~up & ~down
+    vertical = center & up & down & ~left & ~right
+    types = np.where(horizontal, CORRIDOR_HORIZONTAL, np.where(vertical, CORRIDOR_VERTICAL, CORRIDOR_NONE))
+
+    runs = {core.DIR_RIGHT: count_runs(horizontal), core.DIR_LEFT: count_runs(horizontal[:, ::-1])[:, ::-1],
+            core.DIR_DOWN: count_runs(vertical.T).T, core.DIR_UP: count_runs(vertical[::-1].T).T[::-1]}
+    return types.astype(np.uint8).tobytes(), \
+        {direction: array("H", run.astype(np.uint16).tobytes()) for direction, run in runs.items()}
+
+
+def parse_level_rows(data: list[str]) -> Level:
+    """Returns level from rows of text scheme, all rows are processed in a single pass"""
+    if not data:
+        raise ValueError("Empty scheme file for game field")
+
+    width, height = max(map(len, data)), len(data)
+    cells = bytearray(b'.' * (width * height))
+    pacman_cell, ghosts_cells, pellets_count, magic_pellets_count = None, [], 0, 0
+    for row, line in enumerate(data):
+        cells[row * width:row * width + len(line)] = line.encode("ascii")
+        if pacman_cell is None and '%' in line:
+            pacman_cell = row, line.index('%')
+        col = line.find('@')
+        while col != -1:
+            ghosts_cells.append((row, col))
+            col = line.find('@', col + 1)
+        pellets_count += line.count(' ')
+        magic_pellets_count += line.count('$')
+    # ghosts are listed column by column, as game always did
+    ghosts_cells.sort(key=lambda cell: (cell[1], cell[0]))
+    return Level(width, height, cells, pacman_cell, ghosts_cells, pellets_count, magic_pellets_count)
+
+
+def read_text_level(file_name: str) -> Level:
+    with open(file_name, 'r', encoding="utf-8") as input_file:
+        return parse_level_rows(input_file.read().split('\n'))
+
+
+def is_compiled_level(file_name: str) -> bool:
+    with open(file_name, 'rb') as input_file:
+        return input_file.read(len(COMPILED_LEVEL_MAGIC)) == COMPILED_LEVEL_MAGIC
+
+
+def compile_level(level: Level, file_name: str, with_free_runs: bool = True) -> None:
+    """Writes level in binary format: header, ghosts cells, cells codes and optionally free runs tables"""
+    pacman_row, pacman_col = level.pacman_cell if level.pacman_cell is not None else (-1, -1)
+    with open(file_name, 'wb') as output_file:
+        output_file.write(HEADER.pack(COMPILED_LEVEL_MAGIC, COMPILED_LEVEL_VERSION,
+                                      FLAG_FREE_RUNS if with_free_runs else 0, level.width, level.height,
+                                      pacman_row, pacman_col, len(level.ghosts_cells),
+                                      level.pellets_count, level.magic_pellets_count))
+        for cell in level.ghosts_cells:
+            output_file.write(GHOST_CELL.pack(*cell))
+        output_file.write(level.cells)
+        if not with_free_runs:
+            return
+
+        output_file.write(bytes(-output_file.tell() % 8))  # tables are aligned for zero copy views
+        free_runs = level.free_runs or build_free_runs(level.width, level.height, level.cells)
+        for direction in FREE_RUNS_DIRECTIONS:
+            table = array("H", free_runs[direction])
+            if sys.byteorder != "little":
+                table.byteswap()
+            output_file.write(table.tobytes())
+
+
+def read_compiled_level(file_name: str) -> Level:
+    """Returns level which cells and free runs are views of memory mapped compiled level file"""
+    with open(file_name, 'rb') as input_file:
+        buffer = mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, flags, width, height, pacman_row, pacman_col, ghosts_count, pellets_count, \
+        magic_pellets_count = HEADER.unpack_from(buffer)
+    if magic != COMPILED_LEVEL_MAGIC or version != COMPILED_LEVEL_VERSION:
+        raise ValueError(f"'{file_name}' is not compiled level of version {COMPILED_LEVEL_VERSION}")
+
+    offset = HEADER.size
+    ghosts_cells = [GHOST_CELL.unpack_from(buffer, offset + GHOST_CELL.size * index) for index in range(ghosts_count)]
+    offset += GHOST_CELL.size * ghosts_count
+    view = memoryview(buffer)
+    cells = view[offset:offset + width * height]
+    offset += width * height
+
+    free_runs = None
+    if flags & FLAG_FREE_RUNS:
+        offset += -offset % 8
+        free_runs = {}
+        for direction in FREE_RUNS_DIRECTIONS:
+            table = view[offset:offset + 2 * width * height].cast('H')
+            if sys.byteorder != "little":
+                table = array("H", table)
+                table.byteswap()
+            free_runs[direction] = table
+            offset += 2 * width * height
+    pacman_cell = (pacman_row, pacman_col) if pacman_row >= 0 else None
+    return Level(width, height, cells, pacman_cell, ghosts_cells, pellets_count, magic_pellets_count,
+                 free_runs, buffer)
+
+
+def read_level(file_name: str) -> Level:
+    """Returns level from text scheme or compiled level file"""
+    if is_compiled_level(file_name):
+        return read_compiled_level(file_name)
+    return read_text_level(file_name)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compiles text level scheme into binary level file")
+    parser.add_argument("source", help="text level scheme file")
+    parser.add_argument("destination", help="compiled level file to write")
+    parser.add_argument("--no-free-runs", action="store_true", help="do not store precomputed wall distances")
+    args = parser.parse_args()
+    compile_level(read_text_level(args.source), args.destination, not args.no_free_runs)
+
+
+if __name__ == '__main__':
+    main()
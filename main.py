@@ -1,12 +1,36 @@
+import argparse
+import os
+import random
 import sys
+import time
 import pygame
 
-from game_field import GameField
-from essences import Pacman, Ghost
+from essences import Pacman
+from simulation import Simulation, STATE_RUNNING, STATE_WON, STATE_LOST
+from renderer import DirtyRectRenderer
+from hud import get_font
+from scheduler import FixedStepScheduler
+from replay import Recorder
+from server import ServerConnection, apply_tick, MSG_TICK
+from preloader import Preloader
+from profiler import FrameProfiler, NullProfiler, NULL_PROFILER, TRACE_JSONL, TRACE_CHROME
 import core
 
 
 LEVELS_FILES = ["original level.txt", "level 2.txt"]
+# images decoded in background while start screen is shown
+PRELOADED_IMAGES = [("pacman_sprite_sheet.png", None), ("ghost.png", None), ("ghost_blue.png", None)]
+MENU_SCREEN_SIZE = 800, 800
+MAX_FPS = 60
+
+
+def get_screen(size: tuple[int, int]) -> pygame.Surface:
+    """Returns display surface of given size, display mode is set only if its size differs,
+    because setting it may recreate window"""
+    screen = pygame.display.get_surface()
+    if screen is None or screen.get_size() != tuple(size):
+        screen = pygame.display.set_mode(size)
+    return screen
 
 
 def info_screen(text: list, screen: pygame.Surface) -> int:
@@ -15,9 +39,9 @@ def info_screen(text: list, screen: pygame.Surface) -> int:
     1 if level 1 was chosen,
     2 if level 2 was chosen"""
     width, height = screen.get_size()
-    background = pygame.transform.scale(core.load_image("start_screen.png"), (width, height))
+    background = core.get_image("start_screen.png", (width, height))
     screen.blit(background, (0, 0))
-    text_font = pygame.font.Font(None, 50)
+    text_font = get_font(50)
     current_text_y = 30  # 30 is start height for intro text
     for line in text:
         string_rendered = text_font.render(line, True, pygame.Color('white'))
@@ -27,21 +51,24 @@ def info_screen(text: list, screen: pygame.Surface) -> int:
         text_rect.x = width // 2 - text_rect.width // 2
         current_text_y += text_rect.height
         screen.blit(string_rendered, text_rect)
+    pygame.display.flip()
 
+    # screen does not change, so process sleeps until something happens
     while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit(0)
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_1:
-                    return 1
-                elif event.key == pygame.K_2:
-                    return 2
-        pygame.display.flip()
-
-
-def process_key_pressed(event, pacman: Pacman) -> None:
+        event = pygame.event.wait()
+        if event.type == pygame.QUIT:
+            pygame.quit()
+            sys.exit(0)
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_1:
+                return 1
+            elif event.key == pygame.K_2:
+                return 2
+        elif event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+            pygame.display.flip()
+
+
+def process_key_pressed(event, pacman: Pacman | Recorder | ServerConnection) -> None:
     """Changes pacman direction by given key pressed event"""
     if event.key == pygame.K_LEFT:
         pacman.change_direction(core.DIR_LEFT)
@@ -53,78 +80,141 @@ def process_key_pressed(event, pacman: Pacman) -> None:
         pacman.change_direction(core.DIR_DOWN)
 
 
-def render_score(screen: pygame.Surface, pacman: Pacman) -> None:
-    """Renders pacman current score """
-    font = pygame.font.Font(None, 50)
-    text = font.render("Score: " + str(pacman.get_score()), True, (100, 255, 100))
-    screen.blit(text, (0, 0))
+def save_recording(recorder: Recorder, record_dir: str | None) -> None:
+    if record_dir is None:
+        return
+    recording = recorder.finish()
+    recording.save(os.path.join(record_dir, f"game_{int(time.time())}_{recording.seed}.pacr"))
 
 
-def start_game(show_start_screen=True, level_index=0):
-    """Starts game
+def start_game(show_start_screen=True, level_index=0, profiler: NullProfiler = NULL_PROFILER,
+               record_dir: str | None = None, preloader: Preloader | None = None):
+    """Starts game, frames phases are measured by given profiler
+    If record_dir is given, recording of the game is saved there
+    Game field is taken from preloader if it is given
     After win or lose returns None if info screen was closed,
     1 if level 1 was chosen,
     2 if level 2 was chosen"""
-    screen = pygame.display.set_mode((800, 800))
     if show_start_screen:
-        level_index = info_screen(["Pacman", "by afobeus", "", "press 1 or 2", "to chose level"], screen)
-    clock = pygame.time.Clock()
-    game_field = GameField()
-    game_field.load_map_scheme(LEVELS_FILES[level_index - 1])
-    screen = pygame.display.set_mode(game_field.get_screen_size())
-    game_field.set_pygame_screen(screen)
-
-    essences_sprite_group = pygame.sprite.Group()
-    pacman = Pacman(core.DIR_LEFT, game_field.get_pacman_cords(), game_field, "pacman_sprite_sheet.png")
-    game_field.set_pacman(pacman)
-    essences_sprite_group.add(pacman)
-    ghosts = [Ghost([GameField.cell_size * col, GameField.cell_size * row], game_field)
-              for row, col in game_field.get_ghosts_cells()]
-    game_field.set_ghosts(ghosts)
-    for ghost in ghosts:
-        essences_sprite_group.add(ghost)
-
-    clock.tick()
+        level_index = info_screen(["Pacman", "by afobeus", "", "press 1 or 2", "to chose level"],
+                                  get_screen(MENU_SCREEN_SIZE))
+    level = LEVELS_FILES[level_index - 1]
+    game_field = preloader.take_game_field(level) if preloader is not None else level
+    simulation = Simulation(game_field, load_images=True, seed=random.randrange(2 ** 32))
+    simulation.profiler = profiler
+    screen = get_screen(simulation.game_field.get_screen_size())
+    scheduler = FixedStepScheduler(simulation, DirtyRectRenderer(screen, simulation, profiler), MAX_FPS)
+    pacman = simulation.pacman
+    recorder = Recorder(simulation, level)
+
+    scheduler.start()
     while True:
+        profiler.begin_frame()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                save_recording(recorder, record_dir)
                 return 0
             elif event.type == pygame.KEYDOWN:
-                process_key_pressed(event, pacman)
-
-        if game_field.get_pellets_left() == 0:
+                process_key_pressed(event, recorder)
+        profiler.mark("events")
+
+        game_state = scheduler.run_frame()
+        profiler.end_frame()
+        if game_state != STATE_RUNNING:
+            save_recording(recorder, record_dir)
+            if preloader is not None:
+                preloader.prefetch_levels()
+        if game_state == STATE_WON:
             level_choice = info_screen(["You win!", f"Your score: {pacman.get_score()}" "",
                                        "press 1 or 2", "to chose level"], screen)
             return level_choice
+        elif game_state == STATE_LOST:
+            level_choice = info_screen(["You lose", f"Your score: {pacman.get_score()}", "",
+                                       "press 1 or 2", "to chose level"], screen)
+            return level_choice
+
 
-        for ghost in ghosts:
-            if pygame.sprite.collide_mask(pacman, ghost):
-                if ghost.is_in_magic_state():
-                    ghost.reset_position()
-                else:
-                    level_choice = info_screen(["You lose", f"Your score: {pacman.get_score()}", "",
-                                               "press 1 or 2", "to chose level"], screen)
-                    return level_choice
+def start_thin_client(address: str, match: str, show_start_screen=True, level_index=0,
+                      preloader: Preloader | None = None) -> int:
+    """Joins match hosted by server and draws game from its state stream, keys are sent to server
+    After win or lose returns None if info screen was closed,
+    1 if level 1 was chosen,
+    2 if level 2 was chosen, 0 if window was closed or server disconnected"""
+    if show_start_screen:
+        level_index = info_screen(["Pacman", "by afobeus", "", "press 1 or 2", "to chose level"],
+                                  get_screen(MENU_SCREEN_SIZE))
+    connection = ServerConnection(address)
+    level, tick_ms = connection.join(match, LEVELS_FILES[level_index - 1])
+    game_field = preloader.take_game_field(level) if preloader is not None and level in LEVELS_FILES else level
+    # local simulation is never stepped, it only mirrors state of the server one
+    simulation = Simulation(game_field, load_images=True, tick_ms=tick_ms)
+    screen = get_screen(simulation.game_field.get_screen_size())
+    renderer = DirtyRectRenderer(screen, simulation)
+    clock = pygame.time.Clock()
 
-        ticks_passed = clock.tick()
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                connection.close()
+                return 0
+            elif event.type == pygame.KEYDOWN:
+                process_key_pressed(event, connection)
+
+        for message_type, payload in connection.receive():
+            if message_type == MSG_TICK:
+                apply_tick(simulation, payload)
+        if simulation.state == STATE_RUNNING:
+            renderer.render()
+        clock.tick(MAX_FPS)
+
+        if simulation.state != STATE_RUNNING or connection.closed:
+            connection.close()
+            if preloader is not None:
+                preloader.prefetch_levels()
+            if simulation.state == STATE_RUNNING:
+                return 0
+            title = "You win!" if simulation.state == STATE_WON else "You lose"
+            return info_screen([title, f"Your score: {simulation.pacman.get_score()}", "",
+                                "press 1 or 2", "to chose level"], screen)
 
-        pacman.move(ticks_passed)
-        for ghost in ghosts:
-            ghost.move(ticks_passed, pacman)
-            ghost.update_magic_state(ticks_passed)
 
-        screen.fill("black")
-        game_field.render()
-        essences_sprite_group.draw(screen)
-        render_score(screen, pacman)
-        pygame.display.flip()
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Pacman game")
+    parser.add_argument("--profile-trace", default=None, help="file to write frames phases timings to")
+    parser.add_argument("--profile-format", default=TRACE_JSONL, choices=[TRACE_JSONL, TRACE_CHROME],
+                        help="format of profile trace file")
+    parser.add_argument("--profile-overlay", action="store_true", help="show frames phases timings on screen")
+    parser.add_argument("--record-dir", default=None, help="directory to save recordings of played games to")
+    parser.add_argument("--connect", default=None,
+                        help="HOST:PORT or unix:PATH of game server to play on as thin client")
+    parser.add_argument("--match", default="default", help="name of server match to join or start")
+    return parser.parse_args()
 
 
 if __name__ == '__main__':
+    arguments = parse_arguments()
+    game_profiler = NULL_PROFILER
+    if arguments.profile_trace or arguments.profile_overlay:
+        game_profiler = FrameProfiler(arguments.profile_trace, arguments.profile_format,
+                                      overlay=arguments.profile_overlay)
+
     pygame.init()
     pygame.display.set_caption("Pacman")
-    game_exit_code = start_game(True)
-    while game_exit_code in (1, 2):
-        game_exit_code = start_game(False, game_exit_code)
-
+    get_screen(MENU_SCREEN_SIZE)
+    core.get_image("start_screen.png", MENU_SCREEN_SIZE)
+    # levels and sprites are prepared while player looks at start screen
+    game_preloader = Preloader(LEVELS_FILES, PRELOADED_IMAGES)
+    if arguments.connect is not None:
+        game_exit_code = start_thin_client(arguments.connect, arguments.match, preloader=game_preloader)
+        while game_exit_code in (1, 2):
+            game_exit_code = start_thin_client(arguments.connect, arguments.match, False, game_exit_code,
+                                               game_preloader)
+    else:
+        game_exit_code = start_game(True, profiler=game_profiler, record_dir=arguments.record_dir,
+                                    preloader=game_preloader)
+        while game_exit_code in (1, 2):
+            game_exit_code = start_game(False, game_exit_code, game_profiler, arguments.record_dir, game_preloader)
+
+    game_preloader.close()
+    game_profiler.close()
     pygame.quit()
@@ -0,0 +1,177 @@
+import argparse
+import json
+import sys
+
+import numpy as np
+
+
+WALL, BORDER, PELLET, MAGIC_PELLET, GHOST, PACMAN = (ord(code) for code in "*# $@%")
+MIN_SIDE_CELLS = 5
+
+
+def carve_sidewinder(rooms_rows: int, rooms_cols: int, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    """Returns perfect maze on grid of rooms as two boolean arrays: passages to the east and passages to the north
+    Every row of rooms is cut into random runs, which are joined to the row above by one random room each,
+    so all rows are built at once"""
+    east = rng.random((rooms_rows, rooms_cols)) < 0.5
+    east[0] = True
+    east[:, -1] = False
+
+    # run starts in the first room of every row and after every room without passage to the east
+    starts = np.ones((rooms_rows, rooms_cols), dtype=bool)
+    starts[:, 1:] = ~east[:, :-1]
+    runs_starts = np.flatnonzero(starts)
+    runs_lengths = np.diff(runs_starts, append=starts.size)
+    north = np.zeros(starts.size, dtype=bool)
+    north[runs_starts + (rng.random(runs_starts.size) * runs_lengths).astype(np.int64)] = True
+    north = north.reshape(rooms_rows, rooms_cols)
+    north[0] = False
+    return east, north
+
+
+def build_grid(width: int, height: int, rng: np.random.Generator, loops: float, braid: float) -> np.ndarray:
+    """Returns cells codes of maze walls, rooms are placed in cells with odd indexes and joined by passages,
+    loops is probability of removing any other wall between rooms and braid is part of dead ends opened"""
+    rooms_rows, rooms_cols = (height - 1) // 2, (width - 1) // 2
+    east, north = carve_sidewinder(rooms_rows, rooms_cols, rng)
+    east[:, :-1] |= rng.random((rooms_rows, rooms_cols - 1)) < loops
+    north[1:] |= rng.random((rooms_rows - 1, rooms_cols)) < loops
+
+    if braid > 0:
+        # passages of every room in order up, down, left, right
+        exits = np.stack([north, np.zeros_like(north), np.zeros_like(east), east])
+        exits[1, :-1] = north[1:]
+        exits[2, :, 1:] = east[:, :-1]
+        dead_ends = (exits.sum(axis=0) == 1) & (rng.random((rooms_rows, rooms_cols)) < braid)
+        closed = ~exits
+        closed[0, 0], closed[1, -1], closed[2, :, 0], closed[3, :, -1] = False, False, False, False
+        keys = np.where(closed & dead_ends, rng.random(exits.shape), -1.0)
+        chosen = keys.argmax(axis=0)
+        opened = dead_ends & (keys.max(axis=0) >= 0)
+        rows, cols = np.nonzero(opened & (chosen == 0))
+        north[rows, cols] = True
+        rows, cols = np.nonzero(opened & (chosen == 1))
+        north[rows + 1, cols] = True
+        rows, cols = np.nonzero(opened & (chosen == 2))
+        east[rows, cols - 1] = True
+        rows, cols = np.nonzero(opened & (chosen == 3))
+        east[rows, cols] = True
+
+    grid = np.full((height, width), WALL, dtype=np.uint8)
+    grid[1:2 * rooms_rows:2, 1:2 * rooms_cols:2] = PELLET
+    grid[1:2 * rooms_rows:2, 2:2 * rooms_cols:2][east[:, :-1]] = PELLET
+    grid[2:2 * rooms_rows:2, 1:2 * rooms_cols:2][north[1:]] = PELLET
+    grid[0], grid[-1], grid[:, 0], grid[:, -1] = BORDER, BORDER, BORDER, BORDER
+    return grid
+
+
+def generate_maze(width: int, height: int, seed: int = 0, ghosts_count: int = 4, magic_pellets_count: int = 4,
+                  loops: float = 0.1, braid: float = 1.0) -> np.ndarray:
+    """Returns cells codes of random maze level of given size, same seed always gives same level
+    Pacman starts in the upper left room, ghosts and magic pellets are placed in random free cells"""
+    if width < MIN_SIDE_CELLS or height < MIN_SIDE_CELLS:
+        raise ValueError(f"Maze must be at least {MIN_SIDE_CELLS}x{MIN_SIDE_CELLS} cells")
+
+    rng = np.random.default_rng(seed)
+    grid = build_grid(width, height, rng, loops, braid)
+    grid[1, 1] = PACMAN
+    free_cells = np.flatnonzero(grid.reshape(-1) == PELLET)
+    if ghosts_count + magic_pellets_count > free_cells.size:
+        raise ValueError("Maze is too small for given number of ghosts and magic pellets")
+    chosen = free_cells[rng.choice(free_cells.size, ghosts_count + magic_pellets_count, replace=False)]
+    grid.reshape(-1)[chosen[:ghosts_count]] = GHOST
+    grid.reshape(-1)[chosen[ghosts_count:]] = MAGIC_PELLET
+    return grid
+
+
+def label_components(free: np.ndarray) -> tuple[np.ndarray, int]:
+    """Returns for every cell label of connected area of free cells it belongs to, -1 for walls,
+    and number of areas
+    Horizontal runs of free cells are joined by union-find over all vertical neighbour pairs at once:
+    trees are hooked to smaller roots, then paths are compressed"""
+    width = free.shape[1]
+    starts = free.copy()
+    starts[:, 1:] &= ~free[:, :-1]
+    runs = np.cumsum(starts.reshape(-1)) - 1
+    vertical = (free[:-1] & free[1:]).reshape(-1)
+    upper, lower = runs[:-width][vertical], runs[width:][vertical]
+
+    parents = np.arange(int(runs[-1]) + 1)
+    while True:
+        upper_roots, lower_roots = parents[upper], parents[lower]
+        different = upper_roots != lower_roots
+        if not different.any():
+            break
+        upper, lower = upper[different], lower[different]
+        upper_roots, lower_roots = upper_roots[different], lower_roots[different]
+        np.minimum.at(parents, np.maximum(upper_roots, lower_roots), np.minimum(upper_roots, lower_roots))
+        while True:
+            grandparents = parents[parents]
+            if np.array_equal(grandparents, parents):
+                break
+            parents = grandparents
+    components = int(np.count_nonzero(parents == np.arange(parents.size)))
+    return np.where(free.reshape(-1), parents[runs], -1).reshape(free.shape), components
+
+
+def analyze_maze(grid: np.ndarray) -> dict:
+    """Returns report about level cells codes: whether every pellet is reachable from pacman start,
+    number of dead ends and loop density, which is number of independent cycles per free cell"""
+    free = (grid != WALL) & (grid != BORDER)
+    free_count = int(free.sum())
+    edges = int((free[:, :-1] & free[:, 1:]).sum() + (free[:-1] & free[1:]).sum())
+    neighbours = np.zeros(grid.shape, dtype=np.int8)
+    neighbours[:, 1:] += free[:, :-1]
+    neighbours[:, :-1] += free[:, 1:]
+    neighbours[1:] += free[:-1]
+    neighbours[:-1] += free[1:]
+
+    labels, components = label_components(free)
+    pacman_cells = np.argwhere(grid == PACMAN)
+    pellets = (grid == PELLET) | (grid == MAGIC_PELLET)
+    if pacman_cells.size:
+        unreachable = int(np.count_nonzero(labels[pellets] != labels[tuple(pacman_cells[0])]))
+    else:
+        unreachable = int(pellets.sum())
+    loops = edges - free_count + components
+    return {"width": grid.shape[1], "height": grid.shape[0], "free_cells": free_count,
+            "pellets": int(pellets.sum()), "unreachable_pellets": unreachable, "connected": unreachable == 0,
+            "components": components, "dead_ends": int(np.count_nonzero(free & (neighbours == 1))),
+            "loops": loops, "loop_density": loops / free_count if free_count else 0.0}
+
+
+def grid_to_rows(grid: np.ndarray) -> list[str]:
+    """Returns level scheme rows in text format"""
+    return [row.tobytes().decode("ascii") for row in grid]
+
+
+def write_maze(grid: np.ndarray, file_name: str) -> None:
+    with open(file_name, 'wb') as output_file:
+        for index, row in enumerate(grid):
+            if index:
+                output_file.write(b'\n')
+            output_file.write(row.tobytes())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generates random maze level in text format")
+    parser.add_argument("output", help="level file to write")
+    parser.add_argument("--width", type=int, default=41, help="width in cells")
+    parser.add_argument("--height", type=int, default=41, help="height in cells")
+    parser.add_argument("--seed", type=int, default=0, help="same seed gives same maze")
+    parser.add_argument("--ghosts", type=int, default=4, help="number of ghosts")
+    parser.add_argument("--magic-pellets", type=int, default=4, help="number of magic pellets")
+    parser.add_argument("--loops", type=float, default=0.1, help="probability of removing extra wall between rooms")
+    parser.add_argument("--braid", type=float, default=1.0, help="part of dead ends which are opened")
+    args = parser.parse_args()
+
+    grid = generate_maze(args.width, args.height, args.seed, args.ghosts, args.magic_pellets, args.loops, args.braid)
+    report = analyze_maze(grid)
+    print(json.dumps(report, indent=2), file=sys.stderr)
+    if not report["connected"]:
+        sys.exit(1)
+    write_maze(grid, args.output)
+
+
+if __name__ == '__main__':
+    main()
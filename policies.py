@@ -0,0 +1,97 @@
+import random
+from abc import ABC, abstractmethod
+from collections import deque
+
+from game_field import GameField, get_indexes_by_cords
+import core
+
+
+def find_direction_to(game_field: GameField, start_cell: tuple[int, int], targets: bytes | bytearray,
+                      blocked: set[tuple[int, int]] = frozenset()) -> str | None:
+    """Returns first move direction of the shortest path from start cell to the nearest cell
+    which flat index is marked in targets, None if there is no such path"""
+    width, height, cells, wall_codes = game_field.width, game_field.height, game_field.cells, GameField.wall_codes
+    first_directions = {start_cell: None}
+    queue = deque([start_cell])
+    while queue:
+        row, col = queue.popleft()
+        if targets[row * width + col] and (row, col) != start_cell:
+            return first_directions[(row, col)]
+        for direction, (row_shift, col_shift) in core.cells_shifts.items():
+            next_row, next_col = row + row_shift, col + col_shift
+            if not (0 <= next_row < height and 0 <= next_col < width) or (next_row, next_col) in first_directions:
+                continue
+            if cells[next_row * width + next_col] in wall_codes or (next_row, next_col) in blocked:
+                continue
+            first_directions[(next_row, next_col)] = first_directions[(row, col)] or direction
+            queue.append((next_row, next_col))
+    return None
+
+
+class Policy(ABC):
+    """Scripted pacman player, choose is called before every simulation tick"""
+
+    def __init__(self, seed: int | None = None) -> None:
+        self.random = random.Random(seed)
+        self.last_cell = None
+
+    def choose(self, simulation) -> str | None:
+        """Returns direction pacman should turn to or None to keep current one"""
+        pacman = simulation.pacman
+        x, y = pacman.get_cords()
+        if x % GameField.cell_size or y % GameField.cell_size:
+            return None
+        cell = get_indexes_by_cords(x, y)
+        stuck = simulation.game_field.min_distance_to_wall(pacman.current_direction, x, y) == 0
+        if cell == self.last_cell and not stuck:
+            return None
+
+        self.last_cell = cell
+        return self.choose_at_cell(simulation, cell)
+
+    @abstractmethod
+    def choose_at_cell(self, simulation, cell: tuple[int, int]) -> str | None:
+        """Returns direction pacman should turn to when it enters new cell or stands at wall"""
+
+
+class RandomPolicy(Policy):
+    """Turns to random open direction at every cell, avoids going back unless it is dead end"""
+
+    def choose_at_cell(self, simulation, cell: tuple[int, int]) -> str | None:
+        pacman = simulation.pacman
+        open_directions = [direction for direction in core.cells_shifts
+                           if simulation.game_field.min_distance_to_wall(direction, *pacman.get_cords()) > 0]
+        forward = [direction for direction in open_directions
+                   if not core.is_opposite(direction, pacman.current_direction)]
+        if forward:
+            return self.random.choice(forward)
+        return open_directions[0] if open_directions else None
+
+
+class GreedyPolicy(Policy):
+    """Goes to the nearest pellet by the shortest path"""
+
+    def get_blocked_cells(self, simulation) -> set[tuple[int, int]]:
+        return set()
+
+    def choose_at_cell(self, simulation, cell: tuple[int, int]) -> str | None:
+        return find_direction_to(simulation.game_field, cell, simulation.game_field.live_pellets,
+                                 self.get_blocked_cells(simulation))
+
+
+class CautiousPolicy(GreedyPolicy):
+    """Goes to the nearest pellet avoiding cells next to dangerous ghosts"""
+
+    def get_blocked_cells(self, simulation) -> set[tuple[int, int]]:
+        blocked = set()
+        for ghost in simulation.ghosts:
+            if ghost.is_in_magic_state():
+                continue
+            row, col = get_indexes_by_cords(ghost.current_cords[0] + GameField.cell_size // 2,
+                                            ghost.current_cords[1] + GameField.cell_size // 2)
+            blocked.add((row, col))
+            blocked.update((row + row_shift, col + col_shift) for row_shift, col_shift in core.cells_shifts.values())
+        return blocked
+
+
+POLICIES = {"random": RandomPolicy, "greedy": GreedyPolicy, "cautious": CautiousPolicy}
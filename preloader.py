@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from game_field import GameField
+import core
+
+
+def prepare_game_field(level: str) -> GameField:
+    """Returns game field of level with lookup tables and walls shown on start already built"""
+    game_field = GameField()
+    game_field.load_map_scheme(level)
+    game_field.build_start_walls_chunks()
+    return game_field
+
+
+class Preloader:
+    """Decodes images and prepares game fields of levels on worker thread while menu or game is shown
+    Game field belongs to worker until it is taken, so it is never used by two threads at once,
+    taken ones are prepared again by prefetch_levels, which is called when game is over,
+    so worker does not compete with running game for interpreter"""
+
+    def __init__(self, levels: list[str], images: list[tuple[str, tuple[int, int] | None]]) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="preloader")
+        self.images = self.executor.submit(self.load_images, images)
+        self.levels = levels
+        self.game_fields = {}
+        self.prefetch_levels()
+
+    @staticmethod
+    def load_images(images: list[tuple[str, tuple[int, int] | None]]) -> None:
+        for name, size in images:
+            core.preload_image(name, size)
+
+    def prefetch(self, level: str) -> None:
+        """Starts preparing game field of level if there is no ready or queued one"""
+        if level not in self.game_fields:
+            self.game_fields[level] = self.executor.submit(prepare_game_field, level)
+
+    def prefetch_levels(self) -> None:
+        for level in self.levels:
+            self.prefetch(level)
+
+    def take_game_field(self, level: str) -> GameField:
+        """Returns prepared game field of level, waits for it if it is not ready yet"""
+        future = self.game_fields.pop(level, None)
+        game_field = future.result() if future is not None else prepare_game_field(level)
+        # images are converted by main thread, so they should be decoded before game starts
+        self.images.result()
+        return game_field
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,131 @@
+import json
+import time
+from collections import deque
+
+import pygame
+
+from hud import get_font
+
+
+TRACE_JSONL, TRACE_CHROME = "jsonl", "chrome"
+
+
+class NullProfiler:
+    """Profiler which does nothing, used when profiling is disabled so hooks cost only a call"""
+    enabled = False
+
+    def begin_frame(self) -> None:
+        pass
+
+    def mark(self, phase: str) -> None:
+        pass
+
+    def end_frame(self) -> None:
+        pass
+
+    def draw_overlay(self, screen: pygame.Surface) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class FrameProfiler(NullProfiler):
+    """Measures time of frame phases
+    Every mark attributes time passed since previous mark or frame begin to given phase,
+    phases repeated during a frame are summed up"""
+    enabled = True
+    overlay_color, overlay_font_size, overlay_update_frames = (255, 255, 0), 22, 30
+
+    def __init__(self, trace_file_name: str | None = None, trace_format: str = TRACE_JSONL,
+                 window: int = 300, overlay: bool = False) -> None:
+        if trace_format not in (TRACE_JSONL, TRACE_CHROME):
+            raise ValueError(f"Unknown trace format '{trace_format}'")
+
+        self.trace_format = trace_format
+        self.trace_file = open(trace_file_name, 'w', encoding="utf-8") if trace_file_name else None
+        if self.trace_file is not None and trace_format == TRACE_CHROME:
+            self.trace_file.write("[\n")
+        self.first_trace_event = True
+        self.window = window
+        self.overlay = overlay
+        self.overlay_font = None
+        self.overlay_lines = []
+        self.history = {}
+        self.frames_count = 0
+        self.session_start = time.perf_counter_ns()
+        self.frame_start = self.last_mark = self.session_start
+        self.phases = {}
+        self.events = []
+
+    def begin_frame(self) -> None:
+        self.frame_start = self.last_mark = time.perf_counter_ns()
+        self.phases = {}
+        self.events = []
+
+    def mark(self, phase: str) -> None:
+        now = time.perf_counter_ns()
+        self.phases[phase] = self.phases.get(phase, 0) + now - self.last_mark
+        if self.trace_format == TRACE_CHROME:
+            self.events.append((phase, self.last_mark, now - self.last_mark))
+        self.last_mark = now
+
+    def end_frame(self) -> None:
+        now = time.perf_counter_ns()
+        self.phases["total"] = now - self.frame_start
+        for phase, duration in self.phases.items():
+            self.history.setdefault(phase, deque(maxlen=self.window)).append(duration)
+        if self.trace_file is not None:
+            self.write_trace()
+        self.frames_count += 1
+
+    def write_trace(self) -> None:
+        if self.trace_format == TRACE_JSONL:
+            record = {"frame": self.frames_count, "start_ms": (self.frame_start - self.session_start) / 1e6,
+                      "phases_ms": {phase: duration / 1e6 for phase, duration in self.phases.items()}}
+            self.trace_file.write(json.dumps(record) + '\n')
+            return
+
+        events = [(f"frame {self.frames_count}", self.frame_start, self.phases["total"])] + self.events
+        for name, start, duration in events:
+            event = {"name": name, "ph": "X", "pid": 0, "tid": 0,
+                     "ts": (start - self.session_start) / 1e3, "dur": duration / 1e3}
+            self.trace_file.write(("" if self.first_trace_event else ",\n") + json.dumps(event))
+            self.first_trace_event = False
+
+    def get_percentiles(self, phase: str, percentiles: tuple = (50, 95, 99)) -> list[float]:
+        """Returns given percentiles of phase duration in milliseconds over recent frames"""
+        durations = sorted(self.history.get(phase, ()))
+        if not durations:
+            return [0.0] * len(percentiles)
+        return [durations[min(len(durations) - 1, len(durations) * percentile // 100)] / 1e6
+                for percentile in percentiles]
+
+    def draw_overlay(self, screen: pygame.Surface) -> None:
+        """Draws recent percentiles of every phase, text is rebuilt only once in a while"""
+        if not self.overlay:
+            return
+
+        if self.overlay_font is None:
+            self.overlay_font = get_font(FrameProfiler.overlay_font_size)
+        if self.frames_count % FrameProfiler.overlay_update_frames == 0 or not self.overlay_lines:
+            lines = ["phase p50 / p95 / p99 ms"] + \
+                [f"{phase} " + " / ".join(f"{value:.2f}" for value in self.get_percentiles(phase))
+                 for phase in self.history]
+            self.overlay_lines = [self.overlay_font.render(line, True, FrameProfiler.overlay_color)
+                                  for line in lines]
+        y = screen.get_height() - sum(line.get_height() for line in self.overlay_lines)
+        for line in self.overlay_lines:
+            screen.blit(line, (screen.get_width() - line.get_width(), y))
+            y += line.get_height()
+
+    def close(self) -> None:
+        if self.trace_file is None:
+            return
+        if self.trace_format == TRACE_CHROME:
+            self.trace_file.write("\n]\n")
+        self.trace_file.close()
+        self.trace_file = None
@@ -0,0 +1,148 @@
+import pygame
+
+from game_field import GameField
+from simulation import Simulation
+from hud import ScoreHud
+from profiler import NullProfiler, NULL_PROFILER
+
+
+def interpolate(previous: int, current: int, interpolation: float) -> int:
+    """Returns value between previous and current one, jumps longer than a cell are not smoothed"""
+    if abs(current - previous) > GameField.cell_size:
+        return current
+    return round(previous + (current - previous) * interpolation)
+
+
+class GameRenderer:
+    """Draws simulation state on pygame screen, may work as simulation observer"""
+
+    def __init__(self, screen: pygame.Surface, simulation: Simulation, profiler: NullProfiler = NULL_PROFILER) -> None:
+        self.screen = screen
+        self.simulation = simulation
+        self.profiler = profiler
+        simulation.game_field.set_pygame_screen(screen)
+        self.sprites = [simulation.pacman] + simulation.ghosts
+        self.score_hud = ScoreHud()
+
+    def on_simulation_update(self, simulation: Simulation) -> None:
+        self.render()
+
+    def present(self, rects: list[pygame.Rect] | None = None) -> None:
+        """Shows drawn frame on display, only given areas are updated if they are given"""
+        if rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(rects)
+
+    def get_frame_state(self, interpolation: float, previous_positions: list[tuple[int, int]] | None,
+                        previous_shift: tuple[int, int] | None) -> tuple[list[tuple[int, int]], tuple[int, int]]:
+        """Returns sprites positions and camera shift placed between previous and current simulation state
+        by given interpolation from 0 to 1"""
+        game_field = self.simulation.game_field
+        positions = self.simulation.get_positions()
+        shift = game_field.shift_x, game_field.shift_y
+        if previous_positions is not None:
+            positions = [(interpolate(previous[0], current[0], interpolation),
+                          interpolate(previous[1], current[1], interpolation))
+                         for previous, current in zip(previous_positions, positions)]
+        if previous_shift is not None:
+            shift = interpolate(previous_shift[0], shift[0], interpolation),\
+                interpolate(previous_shift[1], shift[1], interpolation)
+        return positions, shift
+
+    def render(self, interpolation: float = 1.0, previous_positions: list[tuple[int, int]] | None = None,
+               previous_shift: tuple[int, int] | None = None) -> None:
+        """Draws game, sprites and camera are placed between previous and current simulation state
+        by given interpolation from 0 to 1"""
+        game_field = self.simulation.game_field
+        positions, shift = self.get_frame_state(interpolation, previous_positions, previous_shift)
+
+        self.screen.fill("black")
+        game_field.render(shift)
+        self.profiler.mark("field_render")
+        for sprite, (x, y) in zip(self.sprites, positions):
+            if sprite.image is not None:
+                self.screen.blit(sprite.image, (x + shift[0], y + shift[1]))
+        self.profiler.mark("sprites_draw")
+        self.score_hud.draw(self.screen, self.simulation.pacman.get_score())
+        self.profiler.mark("render_score")
+        self.profiler.draw_overlay(self.screen)
+        self.profiler.mark("overlay")
+        self.present()
+        self.profiler.mark("display_flip")
+
+
+class DirtyRectRenderer(GameRenderer):
+    """Redraws and pushes to display only changed areas: old and new places of moved sprites,
+    cells of eaten pellets and score
+    Whole screen is redrawn when camera moves, on first frame and after game field reset"""
+
+    def __init__(self, screen: pygame.Surface, simulation: Simulation, profiler: NullProfiler = NULL_PROFILER) -> None:
+        super().__init__(screen, simulation, profiler)
+        self.drawn_shift = None
+        self.drawn_sprites = [None] * len(self.sprites)
+        self.pellets_log, self.pellets_log_position = None, 0
+
+    def get_sprites_rects(self, positions: list[tuple[int, int]], shift: tuple[int, int]) -> list[tuple]:
+        """Returns screen rect and image of every sprite"""
+        cell_size = GameField.cell_size
+        return [(pygame.Rect(x + shift[0], y + shift[1], cell_size, cell_size), sprite.image)
+                for sprite, (x, y) in zip(self.sprites, positions)]
+
+    def get_pellets_rects(self, shift: tuple[int, int]) -> list[pygame.Rect]:
+        """Returns screen rects of cells which pellets were changed since previous frame"""
+        game_field, cell_size = self.simulation.game_field, GameField.cell_size
+        log = game_field.pellets_log
+        rects = [pygame.Rect((index % game_field.width) * cell_size + shift[0],
+                             (index // game_field.width) * cell_size + shift[1], cell_size, cell_size)
+                 for index in log[self.pellets_log_position:]]
+        self.pellets_log_position = len(log)
+        return rects
+
+    def render(self, interpolation: float = 1.0, previous_positions: list[tuple[int, int]] | None = None,
+               previous_shift: tuple[int, int] | None = None) -> None:
+        game_field = self.simulation.game_field
+        positions, shift = self.get_frame_state(interpolation, previous_positions, previous_shift)
+
+        sprites = self.get_sprites_rects(positions, shift)
+        old_score_rect = self.score_hud.get_rect() if self.score_hud.surface is not None else None
+        score_changed = self.score_hud.update(self.simulation.pacman.get_score())
+        if shift != self.drawn_shift or game_field.pellets_log is not self.pellets_log or self.profiler.enabled \
+                and self.profiler.overlay:
+            self.drawn_shift, self.drawn_sprites = shift, sprites
+            self.pellets_log, self.pellets_log_position = game_field.pellets_log, len(game_field.pellets_log)
+            super().render(interpolation, previous_positions, previous_shift)
+            return
+
+        dirty_rects = self.get_pellets_rects(shift)
+        for (rect, image), drawn in zip(sprites, self.drawn_sprites):
+            if drawn != (rect, image):
+                dirty_rects.append(rect)
+                dirty_rects.append(drawn[0])
+        self.drawn_sprites = sprites
+        score_rect = self.score_hud.get_rect()
+        if score_changed:
+            dirty_rects.append(old_score_rect.union(score_rect))
+        elif score_rect.collidelist(dirty_rects) != -1:
+            dirty_rects.append(score_rect)
+        screen_rect = self.screen.get_rect()
+        dirty_rects = [rect.clip(screen_rect) for rect in dirty_rects if rect.colliderect(screen_rect)]
+        self.profiler.mark("dirty_rects")
+
+        # every area is drawn from background up, so overlapping areas do not blend sprites twice
+        sprites_rects = [rect for rect, _ in sprites]
+        clip = self.screen.get_clip()
+        for rect in dirty_rects:
+            game_field.render_area(rect, shift)
+            self.profiler.mark("field_render")
+            self.screen.set_clip(rect)
+            for index in rect.collidelistall(sprites_rects):
+                if sprites[index][1] is not None:
+                    self.screen.blit(sprites[index][1], sprites_rects[index])
+            self.profiler.mark("sprites_draw")
+            if rect.colliderect(score_rect):
+                self.screen.blit(self.score_hud.surface, (0, 0))
+            self.screen.set_clip(clip)
+            self.profiler.mark("render_score")
+        self.present(dirty_rects)
+        self.profiler.mark("display_flip")
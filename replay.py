@@ -0,0 +1,194 @@
+import argparse
+import os
+import struct
+import sys
+import zlib
+
+import pygame
+
+from simulation import Simulation, STATE_RUNNING
+from renderer import GameRenderer
+import core
+
+
+RECORDING_MAGIC, RECORDING_VERSION = b"PACR", 1
+FLAG_EXACT_COLLISIONS, FLAG_GHOSTS_CHASE, FLAG_FINISHED = 1, 2, 4
+# magic, version, flags, tick ms, seed, level crc32, final ticks, final score, events count, level name length
+HEADER = struct.Struct("<4sBBHQIIIIH")
+DIRECTIONS_CODES = [core.DIR_UP, core.DIR_DOWN, core.DIR_LEFT, core.DIR_RIGHT]
+
+
+def get_level_crc(level_file_name: str) -> int:
+    with open(level_file_name, 'rb') as level_file:
+        return zlib.crc32(level_file.read())
+
+
+def write_varint(output: bytearray, value: int) -> None:
+    while value >= 0x80:
+        output.append(value & 0x7f | 0x80)
+        value >>= 7
+    output.append(value)
+
+
+def read_varint(data: bytes, offset: int) -> tuple[int, int]:
+    """Returns decoded value and offset right after it"""
+    value, shift = 0, 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+class Recording:
+    """Everything needed to reproduce a game: level, seed, simulation settings
+    and ticks when pacman direction was changed"""
+
+    def __init__(self, level: str, seed: int, tick_ms: int, exact_collisions: bool, ghosts_chase: bool,
+                 level_crc: int | None = None) -> None:
+        self.level = level
+        self.seed = seed
+        self.tick_ms = tick_ms
+        self.exact_collisions = exact_collisions
+        self.ghosts_chase = ghosts_chase
+        self.level_crc = level_crc if level_crc is not None else get_level_crc(level)
+        self.events = []
+        self.final_ticks = 0
+        self.final_score = 0
+        # True if game was ended by win or lose, not just closed
+        self.finished = False
+
+    def add_event(self, tick: int, direction: str) -> None:
+        self.events.append((tick, direction))
+
+    def to_bytes(self) -> bytes:
+        """Returns compact representation, every event is varint of ticks since previous event
+        shifted left by two bits with direction code in them"""
+        level_name = self.level.encode("utf-8")
+        flags = (FLAG_EXACT_COLLISIONS if self.exact_collisions else 0) | \
+            (FLAG_GHOSTS_CHASE if self.ghosts_chase else 0) | (FLAG_FINISHED if self.finished else 0)
+        data = bytearray(HEADER.pack(RECORDING_MAGIC, RECORDING_VERSION, flags, self.tick_ms, self.seed,
+                                     self.level_crc, self.final_ticks, self.final_score, len(self.events),
+                                     len(level_name)))
+        data += level_name
+        previous_tick = 0
+        for tick, direction in self.events:
+            write_varint(data, (tick - previous_tick) << 2 | DIRECTIONS_CODES.index(direction))
+            previous_tick = tick
+        return bytes(data)
+
+    @staticmethod
+    def from_bytes(data: bytes) -> "Recording":
+        magic, version, flags, tick_ms, seed, level_crc, final_ticks, final_score, events_count, \
+            level_name_length = HEADER.unpack_from(data)
+        if magic != RECORDING_MAGIC or version != RECORDING_VERSION:
+            raise ValueError(f"Data is not game recording of version {RECORDING_VERSION}")
+
+        offset = HEADER.size + level_name_length
+        level = data[HEADER.size:offset].decode("utf-8")
+        recording = Recording(level, seed, tick_ms, bool(flags & FLAG_EXACT_COLLISIONS),
+                              bool(flags & FLAG_GHOSTS_CHASE), level_crc)
+        recording.final_ticks, recording.final_score = final_ticks, final_score
+        recording.finished = bool(flags & FLAG_FINISHED)
+        tick = 0
+        for _ in range(events_count):
+            value, offset = read_varint(data, offset)
+            tick += value >> 2
+            recording.add_event(tick, DIRECTIONS_CODES[value & 3])
+        return recording
+
+    def save(self, file_name: str) -> None:
+        with open(file_name, 'wb') as output_file:
+            output_file.write(self.to_bytes())
+
+    @staticmethod
+    def load(file_name: str) -> "Recording":
+        with open(file_name, 'rb') as input_file:
+            return Recording.from_bytes(input_file.read())
+
+
+class Recorder:
+    """Records direction changes of pacman in given simulation"""
+
+    def __init__(self, simulation: Simulation, level: str, ghosts_chase: bool = False) -> None:
+        if simulation.seed is None:
+            raise ValueError("Only seeded simulation can be recorded")
+
+        self.simulation = simulation
+        self.recording = Recording(level, simulation.seed, simulation.tick_ms, simulation.load_images, ghosts_chase)
+
+    def change_direction(self, direction: str) -> None:
+        """Changes pacman direction and records it, direction is applied on the next tick"""
+        self.simulation.pacman.change_direction(direction)
+        self.recording.add_event(self.simulation.ticks, direction)
+
+    def finish(self) -> Recording:
+        self.recording.final_ticks = self.simulation.ticks
+        self.recording.final_score = self.simulation.pacman.get_score()
+        self.recording.finished = self.simulation.state != STATE_RUNNING
+        return self.recording
+
+
+def replay(recording: Recording, render_ticks=(), on_render=None, check_level: bool = True,
+           sprites_images: bool = False) -> Simulation:
+    """Plays recorded game headless as fast as possible
+    on_render(simulation) is called after every tick from render_ticks
+    If sprites_images is True, sprites get images for drawing even if recording does not use exact collisions
+    Returns simulation in the state the recorded game ended in"""
+    if check_level and get_level_crc(recording.level) != recording.level_crc:
+        raise ValueError(f"Level '{recording.level}' differs from recorded one")
+
+    simulation = Simulation(recording.level, load_images=recording.exact_collisions, seed=recording.seed,
+                            ghosts_chase=recording.ghosts_chase, tick_ms=recording.tick_ms)
+    if sprites_images:
+        simulation.load_sprites_images()
+    render_ticks = set(render_ticks)
+    pacman, events, event_index = simulation.pacman, recording.events, 0
+    while simulation.state == STATE_RUNNING and simulation.ticks < recording.final_ticks:
+        while event_index < len(events) and events[event_index][0] == simulation.ticks:
+            pacman.change_direction(events[event_index][1])
+            event_index += 1
+        simulation.step()
+        if on_render is not None and simulation.ticks in render_ticks:
+            on_render(simulation)
+    if recording.finished:
+        # tick on which game ended changes only its state
+        simulation.step()
+    return simulation
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replays recorded game and checks its result")
+    parser.add_argument("recording", help="recorded game file")
+    parser.add_argument("--render-ticks", default="", help="comma separated ticks to save screenshots of")
+    parser.add_argument("--output-dir", default=".", help="directory for screenshots")
+    args = parser.parse_args()
+
+    recording = Recording.load(args.recording)
+    render_ticks = [int(tick) for tick in args.render_ticks.split(',') if tick]
+    on_render = None
+    if render_ticks:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        pygame.init()
+        renderers = {}
+
+        def on_render(simulation: Simulation) -> None:
+            if simulation not in renderers:
+                screen = pygame.display.set_mode(simulation.game_field.get_screen_size())
+                renderers[simulation] = GameRenderer(screen, simulation)
+            renderers[simulation].render()
+            pygame.image.save(renderers[simulation].screen,
+                              os.path.join(args.output_dir, f"tick_{simulation.ticks:08d}.png"))
+
+    simulation = replay(recording, render_ticks, on_render)
+    score, ticks = simulation.pacman.get_score(), simulation.ticks
+    print(f"state {simulation.state}, ticks {ticks}, score {score}")
+    if (score, ticks) != (recording.final_score, recording.final_ticks):
+        print(f"mismatch: recorded ticks {recording.final_ticks}, score {recording.final_score}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+import pygame
+
+from simulation import Simulation, STATE_RUNNING
+from renderer import GameRenderer
+
+
+class FixedStepScheduler:
+    """Runs simulation by fixed ticks independently of rendering, which is capped by max_fps
+    Frames are drawn between two last simulation states, so movement stays smooth at any rates"""
+
+    def __init__(self, simulation: Simulation, renderer: GameRenderer | None = None,
+                 max_fps: int = 60, max_frame_ms: int = 250) -> None:
+        self.simulation = simulation
+        self.renderer = renderer
+        self.max_fps = max_fps
+        # longer frames are cut, so slow frame is not followed by avalanche of ticks
+        self.max_frame_ms = max_frame_ms
+        self.clock = pygame.time.Clock()
+        self.accumulator = 0
+        self.remember_state()
+
+    def remember_state(self) -> None:
+        game_field = self.simulation.game_field
+        self.previous_positions = self.simulation.get_positions()
+        self.previous_shift = game_field.shift_x, game_field.shift_y
+
+    def start(self) -> None:
+        """Resets clock, should be called right before first frame"""
+        self.clock.tick()
+        self.accumulator = 0
+
+    def run_frame(self) -> str:
+        """Waits for next frame time, processes all ticks due and draws frame
+        Returns state of the game"""
+        self.accumulator += min(self.clock.tick(self.max_fps), self.max_frame_ms)
+        self.simulation.profiler.mark("frame_wait")
+        tick_ms = self.simulation.tick_ms
+        while self.accumulator >= tick_ms and self.simulation.state == STATE_RUNNING:
+            self.remember_state()
+            self.simulation.step()
+            self.accumulator -= tick_ms
+
+        if self.renderer is not None and self.simulation.state == STATE_RUNNING:
+            self.renderer.render(self.accumulator / tick_ms, self.previous_positions, self.previous_shift)
+        return self.simulation.state
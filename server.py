@@ -0,0 +1,423 @@
+import argparse
+import asyncio
+import random
+import socket
+import struct
+
+from game_field import GameField
+from levels import read_level
+from simulation import Simulation, STATE_RUNNING, STATE_WON, STATE_LOST
+from replay import write_varint, read_varint, DIRECTIONS_CODES
+import core
+
+
+PROTOCOL_VERSION = 1
+# every message is payload length and message type followed by payload
+MESSAGE_HEADER = struct.Struct("<IB")
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+MSG_JOIN, MSG_DIRECTION, MSG_WELCOME, MSG_TICK, MSG_ERROR = range(1, 6)
+# protocol version, match name length and level name length, names follow
+JOIN = struct.Struct("<BBH")
+# protocol version, tick ms and level name length, level name follows
+WELCOME = struct.Struct("<BHH")
+TICK_SCORE, TICK_SHIFT, TICK_STATE = 1, 2, 4
+STATES_CODES = [STATE_RUNNING, STATE_WON, STATE_LOST]
+DEFAULT_LEVELS = ["original level.txt", "level 2.txt"]
+
+
+def write_signed_varint(output: bytearray, value: int) -> None:
+    """Writes zigzag encoded value, so small negative numbers are short too"""
+    write_varint(output, value << 1 if value >= 0 else (-value << 1) - 1)
+
+
+def read_signed_varint(data: bytes, offset: int) -> tuple[int, int]:
+    """Returns decoded value and offset right after it"""
+    value, offset = read_varint(data, offset)
+    return (value >> 1) ^ -(value & 1), offset
+
+
+def encode_message(message_type: int, payload: bytes) -> bytes:
+    return MESSAGE_HEADER.pack(len(payload), message_type) + payload
+
+
+def split_messages(buffer: bytearray) -> list[tuple[int, bytes]]:
+    """Removes all complete messages from the start of buffer
+    Returns list of message types and payloads"""
+    messages, offset = [], 0
+    while len(buffer) - offset >= MESSAGE_HEADER.size:
+        length, message_type = MESSAGE_HEADER.unpack_from(buffer, offset)
+        if length > MAX_MESSAGE_SIZE:
+            raise ValueError(f"Message of {length} bytes is too large")
+        if len(buffer) - offset - MESSAGE_HEADER.size < length:
+            break
+        offset += MESSAGE_HEADER.size
+        messages.append((message_type, bytes(buffer[offset:offset + length])))
+        offset += length
+    del buffer[:offset]
+    return messages
+
+
+async def read_message(reader: asyncio.StreamReader) -> tuple[int, bytes]:
+    length, message_type = MESSAGE_HEADER.unpack(await reader.readexactly(MESSAGE_HEADER.size))
+    if length > MAX_MESSAGE_SIZE:
+        raise ValueError(f"Message of {length} bytes is too large")
+    return message_type, await reader.readexactly(length)
+
+
+def encode_join(match: str, level: str) -> bytes:
+    match_name, level_name = match.encode("utf-8"), level.encode("utf-8")
+    return encode_message(MSG_JOIN, JOIN.pack(PROTOCOL_VERSION, len(match_name), len(level_name)) +
+                          match_name + level_name)
+
+
+def decode_join(payload: bytes) -> tuple[str, str]:
+    """Returns match name and level name"""
+    if len(payload) < JOIN.size:
+        raise ValueError("Join message is too short")
+    version, match_length, level_length = JOIN.unpack_from(payload)
+    if version != PROTOCOL_VERSION:
+        raise ValueError(f"Protocol version {version} is not supported")
+    if len(payload) < JOIN.size + match_length + level_length:
+        raise ValueError("Join message is too short")
+    match = payload[JOIN.size:JOIN.size + match_length].decode("utf-8")
+    level = payload[JOIN.size + match_length:JOIN.size + match_length + level_length].decode("utf-8")
+    return match, level
+
+
+def encode_direction(direction: str) -> bytes:
+    return encode_message(MSG_DIRECTION, bytes([DIRECTIONS_CODES.index(direction)]))
+
+
+def encode_welcome(level: str, tick_ms: int) -> bytes:
+    level_name = level.encode("utf-8")
+    return encode_message(MSG_WELCOME, WELCOME.pack(PROTOCOL_VERSION, tick_ms, len(level_name)) + level_name)
+
+
+def decode_welcome(payload: bytes) -> tuple[str, int]:
+    """Returns level name and tick ms of joined match"""
+    if len(payload) < WELCOME.size:
+        raise ValueError("Welcome message is too short")
+    version, tick_ms, level_length = WELCOME.unpack_from(payload)
+    if version != PROTOCOL_VERSION:
+        raise ValueError(f"Protocol version {version} is not supported")
+    return payload[WELCOME.size:WELCOME.size + level_length].decode("utf-8"), tick_ms
+
+
+def capture_state(simulation: Simulation) -> tuple:
+    """Returns positions and magic flags of pacman and every ghost, score, camera shift and game state"""
+    game_field = simulation.game_field
+    return (simulation.get_positions(), [False] + [ghost.is_in_magic_state() for ghost in simulation.ghosts],
+            simulation.pacman.get_score(), (game_field.shift_x, game_field.shift_y), simulation.state)
+
+
+def encode_tick(tick: int, previous: tuple, current: tuple, pellets: list[tuple[int, bool]]) -> bytes:
+    """Returns tick message with changes from previous captured state to current one:
+    flags and changed score, shift and state, then entities which moved or changed magic state
+    with their moves, then cells which pellets were changed with their eaten state"""
+    positions, magic, score, shift, state = current
+    previous_positions, previous_magic, previous_score, previous_shift, previous_state = previous
+    flags = (TICK_SCORE if score != previous_score else 0) | (TICK_SHIFT if shift != previous_shift else 0) | \
+        (TICK_STATE if state != previous_state else 0)
+    data = bytearray()
+    write_varint(data, tick)
+    data.append(flags)
+    if flags & TICK_SCORE:
+        write_varint(data, score)
+    if flags & TICK_SHIFT:
+        write_signed_varint(data, shift[0])
+        write_signed_varint(data, shift[1])
+    if flags & TICK_STATE:
+        data.append(STATES_CODES.index(state))
+
+    changed = [index for index in range(len(positions))
+               if positions[index] != previous_positions[index] or magic[index] != previous_magic[index]]
+    write_varint(data, len(changed))
+    for index in changed:
+        write_varint(data, index << 1 | magic[index])
+        write_signed_varint(data, positions[index][0] - previous_positions[index][0])
+        write_signed_varint(data, positions[index][1] - previous_positions[index][1])
+    write_varint(data, len(pellets))
+    for index, eaten in pellets:
+        write_varint(data, index << 1 | eaten)
+    return encode_message(MSG_TICK, bytes(data))
+
+
+def apply_tick(simulation: Simulation, payload: bytes) -> int:
+    """Applies changes from tick message to simulation which mirrors server game and is never stepped itself
+    Returns number of the tick"""
+    game_field, pacman, ghosts = simulation.game_field, simulation.pacman, simulation.ghosts
+    tick, offset = read_varint(payload, 0)
+    flags = payload[offset]
+    offset += 1
+    if flags & TICK_SCORE:
+        pacman.current_score, offset = read_varint(payload, offset)
+    if flags & TICK_SHIFT:
+        game_field.shift_x, offset = read_signed_varint(payload, offset)
+        game_field.shift_y, offset = read_signed_varint(payload, offset)
+    if flags & TICK_STATE:
+        simulation.state = STATES_CODES[payload[offset]]
+        offset += 1
+
+    changed_count, offset = read_varint(payload, offset)
+    for _ in range(changed_count):
+        value, offset = read_varint(payload, offset)
+        shift_x, offset = read_signed_varint(payload, offset)
+        shift_y, offset = read_signed_varint(payload, offset)
+        index = value >> 1
+        if index == 0:
+            pacman.current_cords = [pacman.current_cords[0] + shift_x, pacman.current_cords[1] + shift_y]
+            if shift_x or shift_y:
+                pacman.current_direction = (core.DIR_LEFT if shift_x < 0 else core.DIR_RIGHT) if shift_x else \
+                    (core.DIR_UP if shift_y < 0 else core.DIR_DOWN)
+                pacman.update_animation(simulation.tick_ms)
+            continue
+        ghost = ghosts[index - 1]
+        ghost.current_cords = [ghost.current_cords[0] + shift_x, ghost.current_cords[1] + shift_y]
+        ghost.magic_state = bool(value & 1)
+        ghost.update_animation()
+
+    pellets_count, offset = read_varint(payload, offset)
+    for _ in range(pellets_count):
+        value, offset = read_varint(payload, offset)
+        game_field.set_pellet_eaten(value >> 1, bool(value & 1))
+    simulation.ticks = tick
+    return tick
+
+
+def parse_address(address: str) -> tuple[str, str | int]:
+    """Returns socket family name and path or host with port from "unix:PATH" or "HOST:PORT" address"""
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    host, _, port = address.rpartition(':')
+    if not host or not port.isdigit():
+        raise ValueError(f"Address '{address}' is neither HOST:PORT nor unix:PATH")
+    return host, int(port)
+
+
+class Match:
+    """Game hosted by server and connections of clients, which all watch and control the same pacman"""
+
+    def __init__(self, name: str, level: str, game_field: GameField, seed: int, tick_ms: int,
+                 ghosts_chase: bool) -> None:
+        self.name, self.level = name, level
+        self.simulation = Simulation(game_field, seed=seed, ghosts_chase=ghosts_chase, tick_ms=tick_ms)
+        self.start_state = self.state = capture_state(self.simulation)
+        self.pellets_log_position = 0
+        self.clients = []
+
+    def get_keyframe(self) -> bytes:
+        """Returns tick message with all changes since game start, which is sent to joined client first"""
+        live_pellets = self.simulation.game_field.live_pellets
+        pellets = [(index, not live_pellets[index])
+                   for index in dict.fromkeys(self.simulation.game_field.pellets_log[:self.pellets_log_position])]
+        return encode_tick(self.simulation.ticks, self.start_state, self.state, pellets)
+
+    def step(self) -> bytes:
+        """Advances game by one tick
+        Returns tick message with changes made by it"""
+        self.simulation.step()
+        game_field = self.simulation.game_field
+        log, live_pellets = game_field.pellets_log, game_field.live_pellets
+        pellets = [(index, not live_pellets[index]) for index in log[self.pellets_log_position:]]
+        self.pellets_log_position = len(log)
+        previous, self.state = self.state, capture_state(self.simulation)
+        return encode_tick(self.simulation.ticks, previous, self.state, pellets)
+
+
+class GameServer:
+    """Hosts many headless matches in one event loop, all of them are stepped by shared fixed tick
+    Clients join match by name, it is created on the first join and closed when game ends or all clients leave
+    Tick messages are written without waiting, clients which can not keep up are disconnected"""
+
+    def __init__(self, levels: list[str] | None = None, tick_ms: int = Simulation.tick_ms,
+                 ghosts_chase: bool = False, max_client_buffer: int = 256 * 1024) -> None:
+        self.levels = {level: None for level in levels or DEFAULT_LEVELS}
+        self.tick_ms = tick_ms
+        self.ghosts_chase = ghosts_chase
+        self.max_client_buffer = max_client_buffer
+        self.matches = {}
+        self.statistics = {"ticks": 0, "late_ticks": 0, "messages": 0, "bytes": 0, "clients_dropped": 0,
+                           "matches_started": 0, "matches_finished": 0}
+
+    def get_game_field(self, level: str) -> GameField:
+        """Returns new game field of allowed level, level file is parsed once"""
+        if level not in self.levels:
+            raise ValueError(f"Level '{level}' is not hosted by server")
+        if self.levels[level] is None:
+            self.levels[level] = read_level(level)
+        game_field = GameField()
+        game_field.load_level(self.levels[level])
+        return game_field
+
+    def join(self, match_name: str, level: str, writer: asyncio.StreamWriter) -> Match:
+        """Adds client to match with given name, match is created on given level if there is none"""
+        match = self.matches.get(match_name)
+        if match is None:
+            match = Match(match_name, level, self.get_game_field(level), random.randrange(2 ** 32), self.tick_ms,
+                          self.ghosts_chase)
+            self.matches[match_name] = match
+            self.statistics["matches_started"] += 1
+        match.clients.append(writer)
+        return match
+
+    def leave(self, match: Match, writer: asyncio.StreamWriter) -> None:
+        if writer in match.clients:
+            match.clients.remove(writer)
+        if not match.clients and self.matches.get(match.name) is match:
+            del self.matches[match.name]
+        writer.close()
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        match = None
+        try:
+            message_type, payload = await read_message(reader)
+            if message_type != MSG_JOIN:
+                raise ValueError("First message must be join")
+            match_name, level = decode_join(payload)
+            match = self.join(match_name, level, writer)
+            writer.write(encode_welcome(match.level, self.tick_ms))
+            writer.write(match.get_keyframe())
+            while True:
+                message_type, payload = await read_message(reader)
+                if message_type == MSG_DIRECTION and payload and payload[0] < len(DIRECTIONS_CODES):
+                    match.simulation.pacman.change_direction(DIRECTIONS_CODES[payload[0]])
+        except ValueError as error:
+            writer.write(encode_message(MSG_ERROR, str(error).encode("utf-8")))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if match is not None:
+                self.leave(match, writer)
+            else:
+                writer.close()
+
+    def send(self, match: Match, message: bytes) -> None:
+        """Writes message to every client of match without waiting, clients with full buffers are dropped"""
+        for writer in list(match.clients):
+            if writer.is_closing():
+                continue
+            if writer.transport.get_write_buffer_size() > self.max_client_buffer:
+                self.statistics["clients_dropped"] += 1
+                writer.close()
+                continue
+            writer.write(message)
+            self.statistics["messages"] += 1
+            self.statistics["bytes"] += len(message)
+
+    def step(self) -> None:
+        """Advances all matches by one tick and sends changes to their clients, finished matches are closed"""
+        for match in list(self.matches.values()):
+            self.send(match, match.step())
+            if match.simulation.state != STATE_RUNNING:
+                del self.matches[match.name]
+                self.statistics["matches_finished"] += 1
+                for writer in match.clients:
+                    writer.close()
+        self.statistics["ticks"] += 1
+
+    async def run_ticks(self) -> None:
+        """Steps matches every tick_ms milliseconds, ticks which are late are not made up for"""
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            self.step()
+            next_tick += self.tick_ms / 1000
+            delay = next_tick - loop.time()
+            if delay < 0:
+                self.statistics["late_ticks"] += 1
+                next_tick, delay = loop.time(), 0
+            await asyncio.sleep(delay)
+
+    async def serve(self, address: str, on_started=None) -> None:
+        """Accepts clients on "HOST:PORT" or "unix:PATH" address and runs matches until cancelled
+        on_started() is called when server is listening"""
+        host, port = parse_address(address)
+        if host == "unix":
+            server = await asyncio.start_unix_server(self.handle_client, port)
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port)
+        if on_started is not None:
+            on_started()
+        async with server:
+            await self.run_ticks()
+
+
+class ServerConnection:
+    """Blocking connection of thin client to server, has change_direction like pacman,
+    so it can be given to key handlers"""
+
+    def __init__(self, address: str) -> None:
+        host, port = parse_address(address)
+        if host == "unix":
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.connect(port)
+        else:
+            self.socket = socket.create_connection((host, port))
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.buffer = bytearray()
+        # messages which came together with welcome, they are returned by next receive
+        self.pending = []
+        self.closed = False
+
+    def join(self, match: str, level: str) -> tuple[str, int]:
+        """Joins match with given name, it is started on given level if there is none
+        Returns level name and tick ms of joined match"""
+        self.socket.sendall(encode_join(match, level))
+        while True:
+            messages = self.receive(wait=True)
+            for index, (message_type, payload) in enumerate(messages):
+                if message_type == MSG_WELCOME:
+                    self.pending = messages[index + 1:]
+                    return decode_welcome(payload)
+                if message_type == MSG_ERROR:
+                    raise RuntimeError(f"Server refused to join: {payload.decode('utf-8')}")
+            if self.closed:
+                raise RuntimeError("Server closed connection")
+
+    def change_direction(self, direction: str) -> None:
+        self.socket.sendall(encode_direction(direction))
+
+    def receive(self, wait: bool = False) -> list[tuple[int, bytes]]:
+        """Returns all messages received so far, waits for at least some data if wait is True"""
+        self.socket.setblocking(wait)
+        try:
+            while True:
+                data = self.socket.recv(65536)
+                if not data:
+                    self.closed = True
+                    break
+                self.buffer += data
+                if wait:
+                    break
+        except BlockingIOError:
+            pass
+        except ConnectionError:
+            self.closed = True
+        messages, self.pending = self.pending + split_messages(self.buffer), []
+        return messages
+
+    def close(self) -> None:
+        self.socket.close()
+
+
+def run_server(address: str, levels: list[str] | None = None, tick_ms: int = Simulation.tick_ms,
+               ghosts_chase: bool = False) -> None:
+    server = GameServer(levels, tick_ms, ghosts_chase)
+    try:
+        asyncio.run(server.serve(address, lambda: print(f"serving on {address}", flush=True)))
+    except KeyboardInterrupt:
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Hosts many headless pacman matches for thin clients")
+    parser.add_argument("--address", default="127.0.0.1:7777", help="HOST:PORT or unix:PATH to listen on")
+    parser.add_argument("--levels", nargs="+", default=DEFAULT_LEVELS, help="level files clients may choose")
+    parser.add_argument("--tick-ms", type=int, default=Simulation.tick_ms, help="length of one tick")
+    parser.add_argument("--ghosts-chase", action="store_true", help="ghosts hunt pacman")
+    args = parser.parse_args()
+    run_server(args.address, args.levels, args.tick_ms, args.ghosts_chase)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+import random
+
+import pygame
+
+from game_field import GameField, get_indexes_by_cords
+from essences import Pacman, Ghost
+from swarm import GhostSwarm
+from profiler import NULL_PROFILER
+import core
+
+
+STATE_RUNNING, STATE_WON, STATE_LOST = "running", "won", "lost"
+
+
+class Simulation:
+    """Game logic core which owns game field, pacman and ghosts
+    Does not need display, real clock or loaded images, so it can be run headless
+    and much faster than real time"""
+    tick_ms = 16
+
+    def __init__(self, level: str | GameField, load_images: bool = False, seed: int | None = None,
+                 ghosts_chase: bool = False, tick_ms: int | None = None, ghost_swarm: bool = False) -> None:
+        """Level is either scheme file name or already loaded game field, which is reset to start state
+        If seed is given, ghosts use their own random generator, else global random module
+        If ghosts_chase is True, ghosts hunt pacman by shared distance field instead of wandering
+        Tick_ms sets length of one fixed tick, class default is used if it is not given
+        If ghost_swarm is True, ghosts are moved together by vectorized GhostSwarm, which suits levels
+        with hundreds of ghosts"""
+        if isinstance(level, GameField):
+            self.game_field = level
+            self.game_field.reset()
+        else:
+            self.game_field = GameField()
+            self.game_field.load_map_scheme(level)
+        self.load_images = load_images
+        self.seed = seed
+        self.random = random.Random(seed) if seed is not None else random
+
+        self.pacman = Pacman(core.DIR_LEFT, self.game_field.get_pacman_cords(), self.game_field,
+                             "pacman_sprite_sheet.png" if load_images else None)
+        self.game_field.set_pacman(self.pacman)
+        if ghost_swarm:
+            self.ghost_swarm = GhostSwarm(self.game_field.get_ghosts_cells(), self.game_field, load_images,
+                                          self.random, ghosts_chase)
+            self.ghosts = self.ghost_swarm.ghosts
+        else:
+            self.ghost_swarm = None
+            self.ghosts = [Ghost([GameField.cell_size * col, GameField.cell_size * row], self.game_field,
+                                 load_images, self.random, ghosts_chase)
+                           for row, col in self.game_field.get_ghosts_cells()]
+        self.game_field.set_ghosts(self.ghosts)
+
+        self.tick_ms = tick_ms or Simulation.tick_ms
+        self.state = STATE_RUNNING
+        self.ticks = 0
+        self.time_passed = 0
+        self.observers = []
+        self.profiler = NULL_PROFILER
+
+    def load_sprites_images(self) -> None:
+        """Gives images for drawing to sprites of simulation created without them,
+        collisions are still checked by cells, so game goes the same way"""
+        if not self.pacman.frames:
+            self.pacman.cut_sheet("pacman_sprite_sheet.png")
+        for owner in [self.ghost_swarm] if self.ghost_swarm is not None else self.ghosts:
+            owner.regular_image, owner.blue_image = core.get_image("ghost.png"), core.get_image("ghost_blue.png")
+        for ghost in self.ghosts if self.ghost_swarm is None else []:
+            ghost.update_animation()
+
+    def add_observer(self, observer) -> None:
+        """Adds object which on_simulation_update(simulation) method is called after every update"""
+        self.observers.append(observer)
+
+    def remove_observer(self, observer) -> None:
+        self.observers.remove(observer)
+
+    def get_positions(self) -> list[tuple[int, int]]:
+        """Returns field cords of pacman and then of every ghost"""
+        if self.ghost_swarm is not None:
+            return [tuple(self.pacman.get_cords())] + self.ghost_swarm.get_positions()
+        return [tuple(self.pacman.get_cords())] + [tuple(ghost.current_cords) for ghost in self.ghosts]
+
+    def get_sprite_cell(self, sprite: pygame.sprite.Sprite) -> tuple[int, int]:
+        """Returns cell of sprite center in coordinates used for collision checks"""
+        x, y = sprite.rect.topleft if self.load_images else sprite.current_cords
+        return get_indexes_by_cords(x + GameField.cell_size // 2, y + GameField.cell_size // 2)
+
+    def get_colliding_ghosts(self) -> list[Ghost]:
+        """Returns ghosts touching pacman in order of ghosts list
+        Ghosts are hashed by cells, only ones in pacman cell or neighbour cells are checked precisely"""
+        if self.ghost_swarm is not None:
+            candidates = self.ghost_swarm.get_ghosts_near(*self.get_sprite_cell(self.pacman), self.load_images)
+            return [self.ghosts[index] for index in candidates if self.is_colliding(self.ghosts[index])]
+
+        ghosts_by_cells = {}
+        for index, ghost in enumerate(self.ghosts):
+            ghosts_by_cells.setdefault(self.get_sprite_cell(ghost), []).append(index)
+
+        pacman_row, pacman_col = self.get_sprite_cell(self.pacman)
+        candidates = sorted(index for row in range(pacman_row - 1, pacman_row + 2)
+                            for col in range(pacman_col - 1, pacman_col + 2)
+                            for index in ghosts_by_cells.get((row, col), ()))
+        return [self.ghosts[index] for index in candidates if self.is_colliding(self.ghosts[index])]
+
+    def is_colliding(self, ghost: Ghost) -> bool:
+        """Returns True if ghost touches pacman"""
+        if self.load_images:
+            return bool(pygame.sprite.collide_mask(self.pacman, ghost))
+        pacman_x, pacman_y = self.pacman.get_cords()
+        ghost_x, ghost_y = ghost.current_cords
+        return abs(pacman_x - ghost_x) < GameField.cell_size and abs(pacman_y - ghost_y) < GameField.cell_size
+
+    def update(self, ticks_passed: int) -> str:
+        """Processes given milliseconds of game
+        Returns state of the game after update"""
+        if self.state != STATE_RUNNING:
+            return self.state
+
+        if self.game_field.get_pellets_left() == 0:
+            self.state = STATE_WON
+            return self.state
+
+        for ghost in self.get_colliding_ghosts():
+            if ghost.is_in_magic_state():
+                ghost.reset_position()
+            else:
+                self.state = STATE_LOST
+                return self.state
+        self.profiler.mark("collisions")
+
+        self.pacman.move(ticks_passed)
+        self.profiler.mark("pacman_move")
+        if self.ghost_swarm is not None:
+            self.ghost_swarm.move(ticks_passed, self.pacman)
+            self.ghost_swarm.update_magic_state(ticks_passed)
+        else:
+            for ghost in self.ghosts:
+                ghost.move(ticks_passed, self.pacman)
+                ghost.update_magic_state(ticks_passed)
+        self.profiler.mark("ghosts_move")
+        self.time_passed += ticks_passed
+
+        for observer in self.observers:
+            observer.on_simulation_update(self)
+        return self.state
+
+    def step(self, ticks: int = 1) -> str:
+        """Advances game by given number of fixed ticks of tick_ms milliseconds
+        Returns state of the game after all ticks processed"""
+        for _ in range(ticks):
+            if self.update(self.tick_ms) != STATE_RUNNING:
+                break
+            self.ticks += 1
+        return self.state
@@ -0,0 +1,173 @@
+import struct
+
+import numpy as np
+
+from simulation import Simulation, STATE_RUNNING, STATE_WON, STATE_LOST
+from replay import write_varint, read_varint, DIRECTIONS_CODES
+
+
+SNAPSHOT_MAGIC, SNAPSHOT_VERSION = b"PACS", 1
+NO_DIRECTION = 255
+STATES_CODES = [STATE_RUNNING, STATE_WON, STATE_LOST]
+# magic, version, state, width, height, ticks, time passed, shift x and y, pellets left and eaten,
+# ghosts count, pellets cells count
+HEADER = struct.Struct("<4sBBIIIQiiIIII")
+# cords, rect position, direction and next one, ticks and animation ticks passed, animation state,
+# shown frame index (-1 if images are not loaded) and score
+PACMAN = struct.Struct("<iiiiBBiiiiq")
+# random generator version, its 624 words and position, whether there is gauss_next and its value
+RANDOM_STATE = struct.Struct("<B625IBd")
+# -1 cords and cells stand for None of Ghost attributes
+GHOST_DTYPE = np.dtype([("x", "<i4"), ("y", "<i4"), ("rect_x", "<i4"), ("rect_y", "<i4"), ("direction", "u1"),
+                        ("ticks_passed", "<i4"), ("magic", "u1"), ("magic_ticks", "<i4"), ("last_cell_row", "<i4"),
+                        ("last_cell_col", "<i4"), ("last_decision_x", "<i4"), ("last_decision_y", "<i4")])
+# runs of unchanged bytes shorter than this are stored in diff to avoid splitting it into many pieces
+DIFF_MIN_GAP = 8
+
+
+def get_ghosts_table(simulation: Simulation) -> np.ndarray:
+    swarm = simulation.ghost_swarm
+    table = np.empty(len(simulation.ghosts), dtype=GHOST_DTYPE)
+    if swarm is not None:
+        for field in GHOST_DTYPE.names:
+            table[field] = getattr(swarm, field)
+        return table
+
+    for index, ghost in enumerate(simulation.ghosts):
+        last_cell = ghost.last_cell_processed or (-1, -1)
+        last_decision = ghost.last_decision_cords or (-1, -1)
+        table[index] = (ghost.current_cords[0], ghost.current_cords[1], ghost.rect.x, ghost.rect.y,
+                        DIRECTIONS_CODES.index(ghost.current_direction), ghost.ticks_passed, ghost.magic_state,
+                        ghost.magic_state_ticks, last_cell[0], last_cell[1], last_decision[0], last_decision[1])
+    return table
+
+
+def set_ghosts_table(simulation: Simulation, table: np.ndarray) -> None:
+    swarm = simulation.ghost_swarm
+    if swarm is not None:
+        for field in GHOST_DTYPE.names:
+            getattr(swarm, field)[:] = table[field]
+        return
+
+    for ghost, (x, y, rect_x, rect_y, direction, ticks_passed, magic, magic_ticks, last_cell_row, last_cell_col,
+                last_decision_x, last_decision_y) in zip(simulation.ghosts, table.tolist()):
+        ghost.current_cords = [x, y]
+        ghost.rect.x, ghost.rect.y = rect_x, rect_y
+        ghost.current_direction = DIRECTIONS_CODES[direction]
+        ghost.ticks_passed = ticks_passed
+        ghost.magic_state, ghost.magic_state_ticks = bool(magic), magic_ticks
+        ghost.last_cell_processed = (last_cell_row, last_cell_col) if last_cell_row >= 0 else None
+        ghost.last_decision_cords = (last_decision_x, last_decision_y) if last_decision_x >= 0 else None
+        ghost.way = None
+        ghost.update_animation()
+
+
+def take_snapshot(simulation: Simulation) -> bytes:
+    """Returns full state of running game: simulation counters, camera, pacman, ghosts, random generator
+    and eaten pellets as bitset over cells which had pellets on level start"""
+    game_field, pacman = simulation.game_field, simulation.pacman
+    pellets_cells = game_field.get_pellets_cells()
+    live_pellets = np.frombuffer(game_field.live_pellets, dtype=np.uint8)[pellets_cells]
+    data = bytearray(HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, STATES_CODES.index(simulation.state),
+                                 game_field.width, game_field.height, simulation.ticks, simulation.time_passed,
+                                 game_field.shift_x, game_field.shift_y, game_field.pellets_left,
+                                 game_field.pellets_eaten, len(simulation.ghosts), len(pellets_cells)))
+    next_direction = NO_DIRECTION if pacman.next_direction is None else DIRECTIONS_CODES.index(pacman.next_direction)
+    data += PACMAN.pack(pacman.current_cords[0], pacman.current_cords[1], pacman.rect.x, pacman.rect.y,
+                        DIRECTIONS_CODES.index(pacman.current_direction), next_direction, pacman.ticks_passed,
+                        pacman.animation_ticks_passed, pacman.animation_state,
+                        pacman.frames.index(pacman.image) if pacman.frames else -1, pacman.current_score)
+    version, words, gauss_next = simulation.random.getstate()
+    data += RANDOM_STATE.pack(version, *words, gauss_next is not None, gauss_next or 0.0)
+    data += get_ghosts_table(simulation).tobytes()
+    data += np.packbits(live_pellets == 0).tobytes()
+    return bytes(data)
+
+
+def restore_snapshot(simulation: Simulation, data: bytes) -> None:
+    """Puts game into state from snapshot taken on the same level with the same number of ghosts"""
+    magic, version, state, width, height, ticks, time_passed, shift_x, shift_y, pellets_left, pellets_eaten, \
+        ghosts_count, pellets_count = HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError(f"Data is not game snapshot of version {SNAPSHOT_VERSION}")
+    game_field, pacman = simulation.game_field, simulation.pacman
+    pellets_cells = game_field.get_pellets_cells()
+    if (width, height, ghosts_count, pellets_count) != (game_field.width, game_field.height,
+                                                         len(simulation.ghosts), len(pellets_cells)):
+        raise ValueError("Snapshot was taken on another level")
+
+    simulation.state, simulation.ticks, simulation.time_passed = STATES_CODES[state], ticks, time_passed
+    game_field.shift_x, game_field.shift_y = shift_x, shift_y
+    game_field.pellets_left, game_field.pellets_eaten = pellets_left, pellets_eaten
+    offset = HEADER.size
+
+    x, y, rect_x, rect_y, direction, next_direction, ticks_passed, animation_ticks_passed, animation_state, frame, \
+        score = PACMAN.unpack_from(data, offset)
+    offset += PACMAN.size
+    pacman.current_cords = [x, y]
+    pacman.rect.x, pacman.rect.y = rect_x, rect_y
+    pacman.current_direction = DIRECTIONS_CODES[direction]
+    pacman.next_direction = None if next_direction == NO_DIRECTION else DIRECTIONS_CODES[next_direction]
+    pacman.ticks_passed, pacman.animation_ticks_passed = ticks_passed, animation_ticks_passed
+    pacman.current_score = score
+    pacman.way = None
+    pacman.animation_state = animation_state
+    if pacman.frames and frame >= 0:
+        pacman.set_frame(frame)
+
+    random_version, *words, has_gauss_next, gauss_next = RANDOM_STATE.unpack_from(data, offset)
+    offset += RANDOM_STATE.size
+    simulation.random.setstate((random_version, tuple(words), gauss_next if has_gauss_next else None))
+
+    table = np.frombuffer(data, dtype=GHOST_DTYPE, count=ghosts_count, offset=offset)
+    offset += table.nbytes
+    set_ghosts_table(simulation, table)
+
+    eaten = np.unpackbits(np.frombuffer(data, dtype=np.uint8, offset=offset), count=pellets_count)
+    live_pellets = np.frombuffer(game_field.live_pellets, dtype=np.uint8)
+    live_pellets[pellets_cells] = eaten ^ 1
+    # readers of pellets log see new list, so they redraw all pellets
+    game_field.pellets_log = []
+    game_field.distance_field, game_field.distance_field_cell = None, None
+
+
+def diff_snapshots(base: bytes, snapshot: bytes) -> bytes:
+    """Returns difference of snapshot from base one taken in the same game, which is list of changed pieces,
+    every piece is varints of offset from previous piece end and length followed by new bytes"""
+    if len(base) != len(snapshot):
+        raise ValueError("Snapshots of different games can not be compared")
+
+    changed = np.flatnonzero(np.frombuffer(base, dtype=np.uint8) != np.frombuffer(snapshot, dtype=np.uint8))
+    data = bytearray()
+    write_varint(data, len(snapshot))
+    if not len(changed):
+        return bytes(data)
+    # pieces start at changed bytes after long enough gaps
+    breaks = np.flatnonzero(np.diff(changed) > DIFF_MIN_GAP)
+    starts = np.concatenate(([changed[0]], changed[breaks + 1])).tolist()
+    ends = np.concatenate((changed[breaks], [changed[-1]])).tolist()
+    position = 0
+    for start, end in zip(starts, ends):
+        write_varint(data, start - position)
+        write_varint(data, end + 1 - start)
+        data += snapshot[start:end + 1]
+        position = end + 1
+    return bytes(data)
+
+
+def patch_snapshot(base: bytes, diff: bytes) -> bytes:
+    """Returns snapshot restored from base one and its difference"""
+    length, offset = read_varint(diff, 0)
+    if length != len(base):
+        raise ValueError("Difference was made from snapshot of another game")
+
+    snapshot = bytearray(base)
+    position = 0
+    while offset < len(diff):
+        skip, offset = read_varint(diff, offset)
+        size, offset = read_varint(diff, offset)
+        position += skip
+        snapshot[position:position + size] = diff[offset:offset + size]
+        position += size
+        offset += size
+    return bytes(snapshot)
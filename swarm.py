@@ -0,0 +1,248 @@
+import random
+
+import numpy as np
+import pygame
+
+from game_field import GameField
+from essences import Ghost, Pacman, choose_direction
+import core
+
+
+# directions are coded by their index in Ghost.directions, so opposite direction code is code ^ 1
+UP, DOWN, LEFT, RIGHT = range(4)
+CELLS_SHIFTS = np.array([core.cells_shifts[direction] for direction in Ghost.directions])
+
+
+class SwarmGhost:
+    """Light view of one ghost of swarm, has the same interface as Ghost for collisions, rendering and policies"""
+    __slots__ = ("swarm", "index")
+
+    def __init__(self, swarm: "GhostSwarm", index: int) -> None:
+        self.swarm = swarm
+        self.index = index
+
+    def __repr__(self) -> str:
+        return f"SwarmGhost({self.index}, {self.current_cords})"
+
+    @property
+    def current_cords(self) -> list[int, int]:
+        return [int(self.swarm.x[self.index]), int(self.swarm.y[self.index])]
+
+    @property
+    def current_direction(self) -> str:
+        return Ghost.directions[self.swarm.direction[self.index]]
+
+    @property
+    def start_cords(self) -> list[int, int]:
+        return [int(self.swarm.start_x[self.index]), int(self.swarm.start_y[self.index])]
+
+    @property
+    def rect(self) -> pygame.Rect:
+        return pygame.Rect(int(self.swarm.rect_x[self.index]), int(self.swarm.rect_y[self.index]),
+                           GameField.cell_size, GameField.cell_size)
+
+    @property
+    def image(self) -> pygame.Surface | None:
+        return self.swarm.blue_image if self.swarm.magic[self.index] else self.swarm.regular_image
+
+    @property
+    def mask(self) -> pygame.mask.Mask | None:
+        return self.swarm.blue_mask if self.swarm.magic[self.index] else self.swarm.regular_mask
+
+    def reset_position(self) -> None:
+        self.swarm.reset_position(self.index)
+
+    def set_magic_state(self, new_state: bool) -> None:
+        self.swarm.magic[self.index] = new_state
+        self.swarm.magic_ticks[self.index] = 0
+
+    def is_in_magic_state(self) -> bool:
+        return bool(self.swarm.magic[self.index])
+
+
+class GhostSwarm:
+    """All ghosts of level stored as arrays of positions, directions, timers and magic flags
+    Every tick moves all ghosts by batched array operations with the same rules as Ghost.move,
+    random decisions are taken from rng in ghosts order, so games are the same as with Ghost objects"""
+
+    def __init__(self, start_cells: list[tuple[int, int]], game_field: GameField, load_images: bool = True,
+                 rng: random.Random = random, chase_mode: bool = False) -> None:
+        self.game_field = game_field
+        self.rng = rng
+        self.chase_mode = chase_mode
+        cell_size = GameField.cell_size
+        count = len(start_cells)
+        self.start_y = np.array([row * cell_size for row, _ in start_cells], dtype=np.int64).reshape(count)
+        self.start_x = np.array([col * cell_size for _, col in start_cells], dtype=np.int64).reshape(count)
+        self.x, self.y = self.start_x.copy(), self.start_y.copy()
+        self.rect_x, self.rect_y = self.start_x.copy(), self.start_y.copy()
+        self.direction = np.full(count, UP, dtype=np.int64)
+        self.ticks_passed = np.zeros(count, dtype=np.int64)
+        self.magic = np.zeros(count, dtype=bool)
+        self.magic_ticks = np.zeros(count, dtype=np.int64)
+        # -1 stands for None of Ghost attributes
+        self.last_cell_row, self.last_cell_col = np.full(count, -1, dtype=np.int64), np.full(count, -1, dtype=np.int64)
+        self.last_decision_x, self.last_decision_y = np.full(count, -1, dtype=np.int64), \
+            np.full(count, -1, dtype=np.int64)
+        self.runs = [np.frombuffer(game_field.free_runs[direction], dtype=np.uint16).astype(np.int64)
+                     for direction in Ghost.directions]
+
+        if load_images:
+            self.regular_image = core.get_image("ghost.png")
+            self.blue_image = core.get_image("ghost_blue.png")
+            self.regular_mask = core.get_mask(self.regular_image)
+            self.blue_mask = core.get_mask(self.blue_image)
+        else:
+            self.regular_image = self.blue_image = self.regular_mask = self.blue_mask = None
+        self.ghosts = [SwarmGhost(self, index) for index in range(count)]
+
+    def __len__(self) -> int:
+        return len(self.ghosts)
+
+    def get_distances_to_walls(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Returns distances to wall for objects by their left upper angles, row for every direction
+        Same as GameField.min_distance_to_wall for every object and direction"""
+        cell_size, width = GameField.cell_size, self.game_field.width
+        up, down, left, right = self.runs
+        far_x, far_y = x + cell_size - 1, y + cell_size - 1
+        near_row, near_col, far_row, far_col = y // cell_size, x // cell_size, far_y // cell_size, far_x // cell_size
+        near_near, near_far = near_row * width + near_col, near_row * width + far_col
+        far_near, far_far = far_row * width + near_col, far_row * width + far_col
+
+        distances = np.empty((4, len(x)), dtype=np.int64)
+        near_run, far_run = np.minimum(up[near_near], up[near_far]), np.minimum(up[far_near], up[far_far])
+        distances[UP] = np.minimum(y - cell_size * (near_row - near_run + 1), far_y - cell_size * (far_row - far_run + 1))
+        near_run, far_run = np.minimum(down[near_near], down[near_far]), np.minimum(down[far_near], down[far_far])
+        distances[DOWN] = np.minimum(cell_size * (near_row + near_run) - y - 1,
+                                     cell_size * (far_row + far_run) - far_y - 1)
+        near_run, far_run = np.minimum(left[near_near], left[far_near]), np.minimum(left[near_far], left[far_far])
+        distances[LEFT] = np.minimum(x - cell_size * (near_col - near_run + 1),
+                                     far_x - cell_size * (far_col - far_run + 1))
+        near_run, far_run = np.minimum(right[near_near], right[far_near]), np.minimum(right[near_far], right[far_far])
+        distances[RIGHT] = np.minimum(cell_size * (near_col + near_run) - x - 1,
+                                      cell_size * (far_col + far_run) - far_x - 1)
+        return np.maximum(distances, 0, out=distances)
+
+    def get_random_direction(self, distances: list[int], current_direction: int) -> int:
+        """Returns random available direction, same choice as Ghost.get_random_way"""
+        return choose_direction(self.rng, [direction for direction in range(4) if distances[direction] > 0],
+                                current_direction ^ 1)
+
+    def get_ways_to_pacman(self, x: np.ndarray, y: np.ndarray, distances: np.ndarray,
+                           pacman: Pacman) -> np.ndarray:
+        """Returns direction to reach pacman for every ghost, -1 if it is not possible"""
+        cell_size = GameField.cell_size
+        pacman_x, pacman_y = pacman.get_cords()
+        distances_to_pacman = np.stack([y - (pacman_y + cell_size), pacman_y - (y + cell_size),
+                                        x - (pacman_x + cell_size), pacman_x - (x + cell_size)])
+        aligned = np.stack([x == pacman_x, x == pacman_x, y == pacman_y, y == pacman_y])
+        reachable = aligned & (distances_to_pacman >= 0) & (distances_to_pacman <= distances)
+        return np.where(reachable.any(axis=0), reachable.argmax(axis=0), -1)
+
+    def get_flow_ways(self, moving: np.ndarray, distances: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Returns directions and distances to the nearest cell border for moving ghosts by pacman distance field,
+        direction is -1 if it has to be chosen randomly
+        Same as Ghost.get_flow_way"""
+        cell_size, width = GameField.cell_size, self.game_field.width
+        x, y, current = self.x[moving], self.y[moving], self.direction[moving]
+        columns = np.arange(len(x))
+        current_distances = distances[current, columns]
+        deciding = (x % cell_size == 0) & (y % cell_size == 0) & \
+            ~((self.last_decision_x[moving] == x) & (self.last_decision_y[moving] == y) & (current_distances > 0))
+        directions, ways_distances = current.copy(), current_distances.copy()
+
+        if deciding.any():
+            indexes = moving[deciding]
+            self.last_decision_x[indexes], self.last_decision_y[indexes] = x[deciding], y[deciding]
+            distance_field = np.frombuffer(self.game_field.get_pacman_distance_field(), dtype=np.int32)
+            deciding_distances = distances[:, deciding]
+            neighbours = ((y[deciding] // cell_size + CELLS_SHIFTS[:, :1]) * width +
+                          x[deciding] // cell_size + CELLS_SHIFTS[:, 1:])
+            steps = np.where(deciding_distances > 0, distance_field[np.where(deciding_distances > 0, neighbours, 0)],
+                             -1).astype(np.int64)
+            scores = np.where(self.magic[indexes], -steps, steps)
+            scores = np.where(steps >= 0, scores, np.iinfo(np.int64).max)
+            best = scores.min(axis=0)
+            candidates = (scores == best) & (steps >= 0)
+            deciding_current = current[deciding]
+            keeps_direction = candidates[deciding_current, np.arange(len(indexes))]
+            best_directions = np.where(keeps_direction, deciding_current, candidates.argmax(axis=0))
+            best_directions[~candidates.any(axis=0)] = -1
+            directions[deciding] = best_directions
+            ways_distances[deciding] = deciding_distances[np.maximum(best_directions, 0), np.arange(len(indexes))]
+
+        horizontal = directions >= LEFT
+        offsets = np.where(horizontal, x % cell_size, y % cell_size)
+        distances_to_borders = np.where((directions == LEFT) | (directions == UP),
+                                        np.where(offsets > 0, offsets, cell_size), cell_size - offsets)
+        directions = np.where(ways_distances == 0, -1, directions)
+        return directions, np.minimum(ways_distances, distances_to_borders)
+
+    def move(self, ticks_passed: int, pacman: Pacman) -> None:
+        """Moves all ghosts by given milliseconds passed from last frame processed"""
+        self.ticks_passed += ticks_passed
+        moving = np.flatnonzero(self.ticks_passed >= Ghost.ticks_to_move_1_px)
+        if not len(moving):
+            return
+
+        cell_size = GameField.cell_size
+        x, y = self.x[moving], self.y[moving]
+        cell_row, cell_col = y // cell_size, x // cell_size
+        distances = self.get_distances_to_walls(x, y)
+        columns = np.arange(len(moving))
+        if self.chase_mode:
+            directions, ways_distances = self.get_flow_ways(moving, distances)
+        else:
+            current = self.direction[moving]
+            ways = self.get_ways_to_pacman(x, y, distances, pacman)
+            directions = np.where(ways >= 0, np.where(self.magic[moving], ways ^ 1, ways), current)
+            new_cell = (cell_row != self.last_cell_row[moving]) | (cell_col != self.last_cell_col[moving])
+            directions[(ways < 0) & new_cell] = -1
+            ways_distances = distances[np.maximum(directions, 0), columns]
+            directions[ways_distances == 0] = -1
+
+        # random decisions are taken one by one in ghosts order to keep random generator sequence
+        for column in np.flatnonzero(directions < 0).tolist():
+            direction = self.get_random_direction(distances[:, column].tolist(), int(self.direction[moving[column]]))
+            directions[column], ways_distances[column] = direction, distances[direction, column]
+
+        steps = np.minimum(ways_distances, self.ticks_passed[moving] // Ghost.ticks_to_move_1_px)
+        x += np.where(directions == RIGHT, steps, 0) - np.where(directions == LEFT, steps, 0)
+        y += np.where(directions == DOWN, steps, 0) - np.where(directions == UP, steps, 0)
+        self.direction[moving] = directions
+        self.x[moving], self.y[moving] = x, y
+        self.rect_x[moving], self.rect_y[moving] = x + self.game_field.shift_x, y + self.game_field.shift_y
+        self.update_magic_state(ticks_passed, moving)
+        self.ticks_passed[moving] %= Ghost.ticks_to_move_1_px
+        self.last_cell_row[moving], self.last_cell_col[moving] = cell_row, cell_col
+
+    def update_magic_state(self, ticks_passed: int, indexes: np.ndarray | slice = slice(None)) -> None:
+        """Turns off magic state of ghosts with given indexes, all by default, if enough time passed"""
+        magic_ticks = self.magic_ticks[indexes] + ticks_passed
+        ended = magic_ticks >= Ghost.ticks_to_end_magic_state
+        self.magic_ticks[indexes] = np.where(ended, 0, magic_ticks)
+        if ended.any():
+            magic = self.magic[indexes]
+            magic[ended] = False
+            self.magic[indexes] = magic
+
+    def set_magic_state(self, new_state: bool) -> None:
+        self.magic[:] = new_state
+        self.magic_ticks[:] = 0
+
+    def reset_position(self, index: int) -> None:
+        self.x[index], self.y[index] = self.start_x[index], self.start_y[index]
+        self.magic[index] = False
+        self.last_decision_x[index] = self.last_decision_y[index] = -1
+
+    def get_positions(self) -> list[tuple[int, int]]:
+        return list(zip(self.x.tolist(), self.y.tolist()))
+
+    def get_ghosts_near(self, row: int, col: int, use_rects: bool) -> list[int]:
+        """Returns ascending indexes of ghosts which centers are in given cell or its neighbours,
+        rects are used for centers if use_rects is True, else field cords"""
+        x, y = (self.rect_x, self.rect_y) if use_rects else (self.x, self.y)
+        half_cell = GameField.cell_size // 2
+        near = (np.abs((y + half_cell) // GameField.cell_size - row) <= 1) & \
+            (np.abs((x + half_cell) // GameField.cell_size - col) <= 1)
+        return np.flatnonzero(near).tolist()
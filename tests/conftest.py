@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+
+@pytest.fixture(autouse=True)
+def repository_directory(monkeypatch):
+    """Levels and images are found relative to working directory"""
+    monkeypatch.chdir(ROOT)
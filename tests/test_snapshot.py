@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+from simulation import Simulation
+from snapshot import take_snapshot, restore_snapshot, diff_snapshots, patch_snapshot
+from replay import DIRECTIONS_CODES
+
+
+LEVELS = ["original level.txt", "level 2.txt"]
+MODES = {"plain": {}, "images": {"load_images": True}, "swarm": {"ghost_swarm": True},
+         "chase": {"ghosts_chase": True}}
+
+
+def play(simulation: Simulation, keys: random.Random, ticks: int) -> list:
+    """Plays given number of ticks with random keys, returns everything observable after every tick"""
+    trace = []
+    for _ in range(ticks):
+        if keys.random() < 0.03:
+            simulation.pacman.change_direction(keys.choice(DIRECTIONS_CODES))
+        simulation.step()
+        game_field = simulation.game_field
+        trace.append((simulation.state, simulation.get_positions(), simulation.pacman.get_score(),
+                      tuple(simulation.pacman.rect), [tuple(ghost.rect) for ghost in simulation.ghosts],
+                      [ghost.is_in_magic_state() for ghost in simulation.ghosts], game_field.shift_x,
+                      game_field.shift_y, bytes(game_field.live_pellets)))
+    return trace
+
+
+@pytest.mark.parametrize("level", LEVELS)
+@pytest.mark.parametrize("mode", MODES)
+def test_restored_game_goes_the_same_way(level, mode):
+    original = Simulation(level, seed=7, **MODES[mode])
+    keys = random.Random(1)
+    play(original, keys, 200)
+    snapshot, keys_state = take_snapshot(original), keys.getstate()
+    expected = play(original, keys, 600)
+
+    restored = Simulation(level, seed=99, **MODES[mode])
+    restore_snapshot(restored, snapshot)
+    keys.setstate(keys_state)
+    assert play(restored, keys, 600) == expected
+
+    # rollback of the same game
+    restore_snapshot(original, snapshot)
+    keys.setstate(keys_state)
+    assert play(original, keys, 600) == expected
+
+
+def test_snapshot_of_restored_game_is_the_same():
+    original = Simulation(LEVELS[0], seed=3)
+    play(original, random.Random(2), 300)
+    snapshot = take_snapshot(original)
+    restored = Simulation(LEVELS[0], seed=4)
+    restore_snapshot(restored, snapshot)
+    assert take_snapshot(restored) == snapshot
+
+
+def test_diff_patches_base_into_snapshot():
+    simulation = Simulation(LEVELS[1], seed=5)
+    keys = random.Random(3)
+    base = take_snapshot(simulation)
+    for _ in range(5):
+        play(simulation, keys, 100)
+        snapshot = take_snapshot(simulation)
+        diff = diff_snapshots(base, snapshot)
+        assert len(diff) < len(snapshot)
+        assert patch_snapshot(base, diff) == snapshot
+    assert patch_snapshot(base, diff_snapshots(base, base)) == base
+
+
+def test_snapshot_of_another_level_is_rejected():
+    snapshot = take_snapshot(Simulation(LEVELS[0], seed=1))
+    with pytest.raises(ValueError):
+        restore_snapshot(Simulation(LEVELS[1], seed=1), snapshot)
+    with pytest.raises(ValueError):
+        restore_snapshot(Simulation(LEVELS[0], seed=1), b"XXXX" + snapshot[4:])